@@ -1,6 +1,118 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .cache import access_changed
+from .forms import GrantImportForm
+from .grants import CONTENT_TYPES, GrantImporter, iter_grants, read_rows
 from .models import Report, UserReportAccess
+from .pagination import EstimatedCountPaginator
+from .streaming import streaming_response
+
+
+def stream_grants(request, queryset, fmt):
+    """streamed download of the grants in `queryset`"""
+    response = streaming_response(request, iter_grants(queryset, fmt), content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="grants.{fmt}"'
+    return response
+
 
 # Register your models here.
-admin.site.register(Report)
-admin.site.register(UserReportAccess)
\ No newline at end of file
+@admin.register(Report)
+class ReportAdmin(admin.ModelAdmin):
+    list_display = ("name", "slug", "cadence", "time_deadline")
+    list_select_related = ("time_deadline",)
+    list_filter = ("cadence",)
+    search_fields = ("name", "slug")        # also what the grant admin's report autocomplete searches
+    show_full_result_count = False          # skip the second, unfiltered COUNT(*) on searches
+    paginator = EstimatedCountPaginator
+    actions = ["export_grants"]
+
+    @admin.action(description="Export access grants of selected reports (CSV)")
+    def export_grants(self, request, queryset):
+        return stream_grants(request, UserReportAccess.objects.filter(report__in=queryset), "csv")
+
+
+@admin.register(UserReportAccess)
+class UserReportAccessAdmin(admin.ModelAdmin):
+    list_display = ("user", "report", "role", "granted_at", "expires_at")
+    list_select_related = ("user", "report")
+    list_filter = ("role",)
+    search_fields = ("user__username", "user__email", "report__name", "report__slug")
+    autocomplete_fields = ("user", "report")        # not a <select> of every user/report on the change form
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    actions = ["export_csv", "export_jsonl", "make_view", "make_edit", "make_owner"]
+    change_list_template = "admin/core/userreportaccess/change_list.html"
+
+    def get_urls(self):
+        return [
+            path("import/", self.admin_site.admin_view(self.import_view), name="core_userreportaccess_import"),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """upload a CSV/JSONL file of grants, upserted in chunks (see core.grants)"""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+
+        form = GrantImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            upload.seek(0)
+            stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+            importer = GrantImporter()
+            try:
+                importer.run(read_rows(stream, form.cleaned_data["format"]))
+            except UnicodeDecodeError:
+                # chunks before the bad byte are already saved, say so rather than pretend nothing happened
+                self.message_user(
+                    request, f"The file isn't UTF-8, stopped after {importer.imported} grants.", messages.ERROR
+                )
+
+            self.message_user(request, f"Imported {importer.imported} grants.", messages.SUCCESS)
+            for line, message in importer.errors[:20]:
+                self.message_user(request, f"Line {line}: {message}", messages.WARNING)
+            if len(importer.errors) > 20:
+                self.message_user(request, f"... and {len(importer.errors) - 20} more invalid rows.", messages.WARNING)
+            return redirect("admin:core_userreportaccess_changelist")
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Import access grants",
+            "form": form,
+        }
+        return TemplateResponse(request, "admin/core/userreportaccess/import.html", context)
+
+    @admin.action(description="Export selected grants (CSV)")
+    def export_csv(self, request, queryset):
+        return stream_grants(request, queryset, "csv")
+
+    @admin.action(description="Export selected grants (JSON lines)")
+    def export_jsonl(self, request, queryset):
+        return stream_grants(request, queryset, "jsonl")
+
+    def set_role(self, request, queryset, role):
+        """one UPDATE for the whole selection instead of a save() per grant"""
+        user_ids = set(queryset.values_list("user_id", flat=True))
+        updated = queryset.update(role=role)
+        # update() skips signals, the role doesn't move deadlines but the cached report lists show it
+        for user_id in user_ids:
+            access_changed(user_id)
+        self.message_user(request, f"Set {updated} grants to {role}.", messages.SUCCESS)
+
+    @admin.action(description="Set role of selected grants to view", permissions=["change"])
+    def make_view(self, request, queryset):
+        self.set_role(request, queryset, "view")
+
+    @admin.action(description="Set role of selected grants to edit", permissions=["change"])
+    def make_edit(self, request, queryset):
+        self.set_role(request, queryset, "edit")
+
+    @admin.action(description="Set role of selected grants to owner", permissions=["change"])
+    def make_owner(self, request, queryset):
+        self.set_role(request, queryset, "owner")
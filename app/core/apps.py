@@ -6,4 +6,9 @@ class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self):
-        from . import signals 
+        from . import checks, signals 
+
+        # count/time queries for the request metrics on every db connection
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_hook
+        connection_created.connect(install_query_hook, dispatch_uid="core_query_metrics")
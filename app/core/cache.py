@@ -0,0 +1,152 @@
+# core/cache.py
+"""
+Small helpers on top of the django cache framework (CACHES in settings).
+
+Versions: a counter per scope (e.g. ("user", 12) or ("reports",)) that core.signals bumps whenever
+something cached data depends on changes. Cache keys embed the current versions, so a bump
+invalidates every dependent entry at once without having to find and delete them.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import Report, UserProfile
+
+VERSION_PREFIX = "core:version"
+
+
+def version_key(scope, ident=None):
+    return f"{VERSION_PREFIX}:{scope}" if ident is None else f"{VERSION_PREFIX}:{scope}:{ident}"
+
+
+def _initial_version():
+    # start from the clock instead of 0 so an evicted counter never comes back at an old value
+    return int(time.time() * 1000)
+
+
+def get_versions(*keys):
+    """current versions for several version keys in one cache round trip (missing ones are created)"""
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_version(), None)
+            found[key] = cache.get(key)
+    return tuple(found[key] for key in keys)
+
+
+async def aget_versions(*keys):
+    """get_versions() for async code"""
+    found = await cache.aget_many(keys)
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, _initial_version(), None)
+            found[key] = await cache.aget(key)
+    return tuple(found[key] for key in keys)
+
+
+def bump_version(scope, ident=None):
+    """invalidate everything cached under this scope"""
+    key = version_key(scope, ident)
+    try:
+        cache.incr(key)
+    except ValueError:      # not set yet / evicted
+        cache.set(key, _initial_version(), None)
+
+
+def access_changed(user_id):
+    """a user's grants changed -> drop their cached pages and their cached report roles (core.permissions)"""
+    bump_version("user", user_id)
+    bump_version("access", user_id)
+
+
+# ---------- home dashboard ----------
+HOME_PREFIX = "core:home"
+
+
+def home_key(user_id, *parts):
+    """key for one user's cached dashboard page, tied to that user's and the global report versions"""
+    versions = get_versions(version_key("user", user_id), version_key("reports"))
+    return _home_key(user_id, versions, parts)
+
+
+async def ahome_key(user_id, *parts):
+    versions = await aget_versions(version_key("user", user_id), version_key("reports"))
+    return _home_key(user_id, versions, parts)
+
+
+def _home_key(user_id, versions, parts):
+    user_version, reports_version = versions
+    suffix = ":".join(str(p) for p in parts)
+    return f"{HOME_PREFIX}:{user_id}:{user_version}:{reports_version}:{suffix}"
+
+
+# ---------- template fragments ----------
+async def afragment_version(user_id):
+    """
+    version stamp for {% cache %} fragments showing a user's reports, changes whenever the user's
+        grants/profile or any report/time slot change (the same versions as the dashboard cache)
+    """
+    versions = await aget_versions(version_key("user", user_id), version_key("reports"))
+    return ".".join(str(v) for v in versions)
+
+
+# ---------- report schedules ----------
+RULES_TIMEOUT = 60 * 60 * 24        # keyed on the reports version, the timeout only drops superseded entries
+
+
+def custom_rules():
+    """
+    the distinct recurrence rules of Custom reports (what ReportQuerySet.with_deadline_offset() needs),
+        cached until any report changes instead of queried on every call
+    """
+    key = f"core:custom_rules:{get_versions(version_key('reports'))[0]}"
+    rules = cache.get(key)
+    if rules is None:
+        rules = tuple(
+            Report.objects.filter(cadence="Custom").order_by().values_list("recurrence_rule", flat=True).distinct()
+        )
+        cache.set(key, rules, RULES_TIMEOUT)
+    return rules
+
+
+# ---------- user profiles ----------
+PROFILE_TIMEOUT = 60 * 60 * 24      # invalidated on save/delete, the timeout only bounds memory use
+
+
+def profile_key(user_id):
+    return f"core:profile:{user_id}"
+
+
+def get_profile(user):
+    """
+    the user's UserProfile (or None) without a query when it's cached, also attached as user.profile
+        so `user.profile` / hasattr(user, "profile") don't query either
+    """
+    key = profile_key(user.pk)
+    profile = cache.get(key)
+    if profile is None:
+        profile = UserProfile.objects.filter(user_id=user.pk).first() or False     # False -> "no profile" is cached too
+        cache.set(key, profile, PROFILE_TIMEOUT)
+
+    if profile is False:
+        return None
+    user.profile = profile
+    return profile
+
+
+async def aget_profile(user):
+    """get_profile() for async code"""
+    key = profile_key(user.pk)
+    profile = await cache.aget(key)
+    if profile is None:
+        profile = await UserProfile.objects.filter(user_id=user.pk).afirst() or False
+        await cache.aset(key, profile, PROFILE_TIMEOUT)
+
+    if profile is False:
+        return None
+    user.profile = profile
+    return profile
+
+
+def forget_profile(user_id):
+    cache.delete(profile_key(user_id))
@@ -0,0 +1,31 @@
+# core/checks.py
+"""
+System checks. The deploy ones run with `manage.py check --deploy` (the migrate service runs it on
+every deploy), so they don't warn for test runs, which always have DEBUG off.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    the cache versions core.signals bumps (report roles, dashboard pages, profiles) only reach other
+        worker processes through a shared cache, with a per-process one a revoked role keeps working in
+        every worker but the one that handled the change
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            f"the default cache ({backend}) is per process, cache invalidations won't reach other workers.",
+            hint="Set CACHE_URL to a shared cache, e.g. redis://redis:6379/1.",
+            id="core.W001",
+        )
+    ]
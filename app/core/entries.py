@@ -0,0 +1,523 @@
+# core/entries.py
+"""
+Whole-table submission of report entries (ReportEntry rows), the backend of the streamlit data entry flow.
+
+A submitted table is validated column by column over the whole batch: types first, then integrity
+(required values, the email foreign key, row_key uniqueness inside the table). Lookups against the db
+are one query per check for the whole table, never one per row. The errors come back as
+{row index: {column: [messages]}} and a table with any invalid row is rejected as a whole (nothing is
+written, the client fixes the rows and sends the table again); a valid table is upserted on
+(report, row_key) in a single transaction.
+
+Concurrent editors: every row carries a `version`. Clients send back the version they read, only rows
+that actually changed are written, and each write is a compare-and-swap on that version, so an edit
+based on a stale copy is reported as a conflict (with the stored row) instead of overwriting it.
+"""
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .cache import get_versions, version_key
+from .grants import chunked
+from .models import ReportEntry, UserReportAccess
+from .permissions import get_report_roles, has_report_role
+
+ENTRY_COLUMNS = ("row_key", "email", "entry_date", "amount", "notes", "version")
+ENTRY_FORMATS = ("json", "csv")
+
+_key_field = ReportEntry._meta.get_field("row_key")
+_amount_field = ReportEntry._meta.get_field("amount")
+
+
+class TableError(ValueError):
+    """the submitted body couldn't be read as a table at all"""
+
+
+def read_table(body, fmt):
+    """list of row dicts from a JSON array (or {"rows": [...]}) or CSV with a header"""
+    text = body.decode("utf-8-sig") if isinstance(body, bytes) else body
+    if fmt == "csv":
+        return list(csv.DictReader(io.StringIO(text)))
+    if fmt != "json":
+        raise TableError(f"unknown format {fmt!r}, expected one of {', '.join(ENTRY_FORMATS)}")
+
+    try:
+        data = json.loads(text)
+    except ValueError as exc:
+        raise TableError(f"invalid JSON: {exc}") from exc
+    rows = data.get("rows") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise TableError("expected a list of row objects")
+    return rows
+
+
+# ---------- column parsers (value -> python value, raise ValueError with the message) ----------
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_row_key(value):
+    if _blank(value):
+        raise ValueError("This field is required.")
+    value = str(value).strip()
+    if len(value) > _key_field.max_length:
+        raise ValueError(f"At most {_key_field.max_length} characters.")
+    return value
+
+
+def parse_date(value):
+    if _blank(value):
+        raise ValueError("This field is required.")
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        raise ValueError(f"{value!r} is not a date (YYYY-MM-DD).") from None
+
+
+def parse_amount(value):
+    if _blank(value) or isinstance(value, bool):
+        raise ValueError("This field is required." if _blank(value) else f"{value!r} is not a number.")
+    try:
+        amount = Decimal(str(value).strip().replace(",", ""))
+    except InvalidOperation:
+        raise ValueError(f"{value!r} is not a number.") from None
+    if not amount.is_finite():
+        raise ValueError(f"{value!r} is not a number.")
+    if amount.as_tuple().exponent < -_amount_field.decimal_places:
+        raise ValueError(f"At most {_amount_field.decimal_places} decimal places.")
+    if abs(amount) >= 10 ** (_amount_field.max_digits - _amount_field.decimal_places):
+        raise ValueError("Number is too large.")
+    return amount
+
+
+def parse_notes(value):
+    return "" if value is None else str(value)
+
+
+def parse_email(value):
+    return None if _blank(value) else str(value).strip().lower()
+
+
+def parse_version(value):
+    """the version the client read (None for rows it hasn't seen, e.g. new ones)"""
+    if _blank(value):
+        return None
+    try:
+        version = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{value!r} is not a version number.") from None
+    if version < 1:
+        raise ValueError("Versions start at 1.")
+    return version
+
+
+PARSERS = {
+    "row_key": parse_row_key,
+    "email": parse_email,
+    "entry_date": parse_date,
+    "amount": parse_amount,
+    "notes": parse_notes,
+    "version": parse_version,
+}
+
+
+# ---------- validation + save ----------
+class EntryTable:
+    """
+    validates and saves one submitted table of `report` entries on behalf of `user`.
+        editors (role edit) can only write rows tied to their own email, owners any user with access
+        to the report. Use .validate() for a dry run, .save() to also write the valid rows.
+    """
+
+    def __init__(self, report, user, rows):
+        self.report = report
+        self.user = user
+        self.rows = rows
+        self.errors = {}        # row index -> {column: [messages]}
+        self.conflicts = []     # (row index, stored ReportEntry)
+        self.versions = []      # version the client read, per row
+        self.created = self.updated = self.unchanged = 0
+        self.is_owner = has_report_role(user, report, "owner")
+
+    def error(self, index, column, message):
+        self.errors.setdefault(index, {}).setdefault(column, []).append(message)
+
+    def parse_columns(self):
+        """{column: [value or None per row]}, type errors recorded per row"""
+        columns = {}
+        for column, parse in PARSERS.items():
+            values = []
+            for index, row in enumerate(self.rows):
+                try:
+                    values.append(parse(row.get(column)))
+                except ValueError as exc:
+                    self.error(index, column, str(exc))
+                    values.append(None)
+            columns[column] = values
+        return columns
+
+    def resolve_users(self, emails):
+        """email per row -> user id per row (None where missing/invalid), one query for the whole table"""
+        own_email = (self.user.email or "").lower()
+        emails = [email or own_email for email in emails]
+
+        users = {}
+        wanted = {e for e in emails if e}
+        if wanted:
+            # only users that have (active) access to this report can own its rows
+            users = dict(
+                UserReportAccess.objects
+                .active()
+                .annotate(email=Lower("user__email"))
+                .filter(report=self.report, email__in=wanted)
+                .values_list("email", "user_id")
+            )
+
+        user_ids = []
+        for index, email in enumerate(emails):
+            user_id = users.get(email) if email else None
+            if not email:
+                self.error(index, "email", "This field is required.")
+            elif user_id is None:
+                self.error(index, "email", f"No user with access to this report has the email {email!r}.")
+            elif user_id != self.user.pk and not self.is_owner:
+                self.error(index, "email", "You can only enter rows for yourself.")
+                user_id = None
+            user_ids.append(user_id)
+        return user_ids
+
+    def check_unique_keys(self, keys):
+        seen = {}
+        for index, key in enumerate(keys):
+            if key is None:
+                continue
+            if key in seen:
+                self.error(index, "row_key", f"Duplicate row_key {key!r} (also in row {seen[key]}).")
+            else:
+                seen[key] = index
+
+    def validate(self):
+        """parse and check every row, returns the valid rows as unsaved ReportEntry objects"""
+        columns = self.parse_columns()
+        user_ids = self.resolve_users(columns["email"])
+        self.check_unique_keys(columns["row_key"])
+        self.versions = columns["version"]
+
+        entries = []
+        for index in range(len(self.rows)):
+            if index in self.errors:
+                continue
+            entries.append(ReportEntry(
+                report=self.report,
+                user_id=user_ids[index],
+                row_key=columns["row_key"][index],
+                entry_date=columns["entry_date"][index],
+                amount=columns["amount"][index],
+                notes=columns["notes"][index],
+            ))
+        return entries
+
+    def save(self, batch_size=500):
+        """
+        validate, then write the rows in one transaction, diffed against what's stored (nothing is
+        written if any row is invalid):
+            - rows that don't exist yet are inserted
+            - rows identical to the stored ones aren't written at all
+            - changed rows are updated with a compare-and-swap on `version` (the version the client
+              read), rows someone else changed in the meantime are reported in `conflicts` instead
+        no row locks are taken, concurrent editors of the same report only ever collide on the same row
+        """
+        entries = self.validate()
+        if self.errors or not entries:
+            return self
+
+        with transaction.atomic():
+            stored = {
+                e.row_key: e
+                for e in ReportEntry.objects.filter(report=self.report, row_key__in=[e.row_key for e in entries])
+            }
+            to_create, to_update = [], []
+            for index, entry in self._indexed(entries):
+                current = stored.get(entry.row_key)
+                if current is None:
+                    to_create.append((index, entry))
+                elif current.user_id != self.user.pk and not self.is_owner:
+                    self.error(index, "row_key", "This row belongs to another user.")
+                elif not _changed(current, entry):
+                    self.unchanged += 1
+                elif self.versions[index] != current.version:
+                    self.conflict(index, current)
+                else:
+                    entry.pk, entry.version = current.pk, current.version
+                    to_update.append((index, entry))
+            if self.errors:
+                self.unchanged = 0
+                return self
+
+            self._create(to_create, batch_size)
+            self._compare_and_swap(to_update, batch_size)
+        return self
+
+    def conflict(self, index, current):
+        self.conflicts.append((index, current))
+
+    def _create(self, indexed, batch_size):
+        """insert new rows, a row_key someone else inserted first (since we read) is a conflict"""
+        if not indexed:
+            return
+        ReportEntry.objects.bulk_create([e for _, e in indexed], batch_size=batch_size, ignore_conflicts=True)
+        stored = {
+            e.row_key: e
+            for e in ReportEntry.objects.filter(report=self.report, row_key__in=[e.row_key for _, e in indexed])
+        }
+        for index, entry in indexed:
+            current = stored[entry.row_key]
+            if current.version == 1 and not _changed(current, entry):
+                self.created += 1
+            else:
+                self.conflict(index, current)
+
+    def _compare_and_swap(self, indexed, batch_size):
+        """
+        update changed rows in chunks, each chunk one statement guarded on the version the client read:
+            UPDATE .. SET <column> = CASE id WHEN .. END, version = version + 1
+            WHERE (id, version) IN (VALUES ..) RETURNING id
+        the returned ids are the rows that were written, the rest were changed by someone else first
+        (row values and RETURNING: sqlite >= 3.35 and postgres)
+        """
+        connection = connections[router.db_for_write(ReportEntry)]
+        quote = connection.ops.quote_name
+        opts = ReportEntry._meta
+        pk, version = quote(opts.pk.column), quote(opts.get_field("version").column)
+        # typed, postgres would take untyped VALUES parameters as text and find no (bigint, integer) = (text, text)
+        pair = f"(CAST(%s AS {opts.pk.db_type(connection)}), CAST(%s AS {opts.get_field('version').db_type(connection)}))"
+        now = opts.get_field("updated_at").get_db_prep_save(timezone.now(), connection)
+
+        lost = []
+        size = min(batch_size, connection.ops.bulk_batch_size([*_WRITE_FIELDS.values()] * 2 + [None] * 2, indexed))
+        with connection.cursor() as cursor:
+            for chunk in chunked(indexed, max(size, 1)):
+                assignments, params = [], []
+                for f in _WRITE_FIELDS.values():
+                    case = f"CASE {pk}{' WHEN %s THEN %s' * len(chunk)} END"
+                    if connection.features.requires_casted_case_in_updates:
+                        case = f"CAST({case} AS {f.db_type(connection)})"
+                    assignments.append(f"{quote(f.column)} = {case}")
+                    for _, e in chunk:
+                        params += [e.pk, f.get_db_prep_save(getattr(e, f.attname), connection)]
+                params.append(now)
+                for _, e in chunk:
+                    params += [e.pk, e.version]
+                cursor.execute(
+                    f"UPDATE {quote(opts.db_table)} SET {', '.join(assignments)}, {version} = {version} + 1, "
+                    f"{quote(opts.get_field('updated_at').column)} = %s "
+                    f"WHERE ({pk}, {version}) IN (VALUES {', '.join([pair] * len(chunk))}) RETURNING {pk}",
+                    params,
+                )
+                written = {row[0] for row in cursor.fetchall()}
+                self.updated += len(written)
+                lost += [(index, e) for index, e in chunk if e.pk not in written]
+
+        if lost:
+            current = ReportEntry.objects.in_bulk([e.pk for _, e in lost])
+            for index, e in lost:
+                self.conflict(index, current[e.pk])
+
+    def _indexed(self, entries):
+        """(row index, entry) for the valid rows, in table order"""
+        valid_rows = (index for index in range(len(self.rows)) if index not in self.errors)
+        return list(zip(valid_rows, entries))
+
+    def result(self):
+        """response body: counts + per row errors + conflicting rows with their stored values"""
+        return {
+            "valid": len(self.rows) - len(self.errors),
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "errors": [
+                {"row": index, "row_key": self.rows[index].get("row_key"), "errors": errors}
+                for index, errors in sorted(self.errors.items())
+            ],
+            "conflicts": [
+                {
+                    "row": index,
+                    "row_key": current.row_key,
+                    "submitted_version": self.versions[index],
+                    "current": _entry_dict(current),
+                }
+                for index, current in sorted(self.conflicts, key=lambda c: c[0])
+            ],
+        }
+
+
+_WRITE_FIELDS = {name: ReportEntry._meta.get_field(name) for name in ("user", "entry_date", "amount", "notes")}
+
+
+def _changed(current, entry):
+    return any(getattr(current, f.attname) != getattr(entry, f.attname) for f in _WRITE_FIELDS.values())
+
+
+def _entry_dict(entry):
+    return {
+        "row_key": entry.row_key,
+        "user_id": entry.user_id,
+        "entry_date": entry.entry_date.isoformat(),
+        "amount": str(entry.amount),
+        "notes": entry.notes,
+        "version": entry.version,
+    }
+
+
+def entries_for(user, report):
+    """the entries `user` can see: all of them for owners, otherwise the rows tied to the user"""
+    entries = ReportEntry.objects.filter(report=report)
+    if not has_report_role(user, report, "owner"):
+        entries = entries.filter(user=user)
+    return entries
+
+
+def iter_entries(queryset, fmt, chunk_size=2000):
+    """yields `queryset` as a JSON array or CSV text in chunks (same columns a table is submitted with)"""
+    rows = (
+        queryset
+        .order_by("row_key")
+        .values_list("row_key", "user__email", "entry_date", "amount", "notes", "version")
+        .iterator(chunk_size=chunk_size)
+    )
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(ENTRY_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == "json":
+        separator = "["
+        for chunk in chunked(rows, chunk_size):
+            yield separator + ",".join(
+                json.dumps({
+                    "row_key": key, "email": email, "entry_date": entry_date.isoformat(),
+                    "amount": str(amount), "notes": notes, "version": version,
+                })
+                for key, email, entry_date, amount, notes, version in chunk
+            )
+            separator = ","
+        yield "]" if separator == "," else "[]"
+    else:
+        raise TableError(f"unknown format {fmt!r}, expected one of {', '.join(ENTRY_FORMATS)}")
+
+
+# ---------- columnar export (Arrow IPC / Parquet) ----------
+EXPORT_COLUMNS = ("report", "row_key", "email", "entry_date", "amount", "notes", "version", "updated_at")
+EXPORT_FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def visible_entries(user, report_ids=None):
+    """entries of every report `user` can view: all rows of reports they own, their own rows on the others"""
+    entries = ReportEntry.objects.all()
+    if not (user.is_active and user.is_superuser):
+        roles = get_report_roles(user)
+        owned = [report_id for report_id, role in roles.items() if role == "owner"]
+        entries = entries.filter(Q(report_id__in=owned) | Q(report_id__in=list(roles), user=user))
+    if report_ids is not None:
+        entries = entries.filter(report_id__in=report_ids)
+    return entries
+
+
+def entries_etag(queryset, fmt):
+    """
+    changes whenever a row in `queryset` is added, removed or written (updated_at) -> If-None-Match.
+        the export also has the report slug and user email of each row, those come from other tables,
+        so the versions core.signals bumps when a report or a user's email is saved are part of it too
+    """
+    state = queryset.aggregate(rows=Count("pk"), changed=Max("updated_at"))
+    reports, emails = get_versions(version_key("reports"), version_key("emails"))
+    changed = state["changed"].timestamp() if state["changed"] else 0
+    return f'"{fmt}-{state["rows"]}-{changed}-{reports}-{emails}"'
+
+
+def _export_rows(queryset, chunk_size):
+    return (
+        queryset
+        .order_by("report_id", "row_key")
+        .values_list(
+            "report__slug", "row_key", "user__email", "entry_date", "amount", "notes", "version", "updated_at"
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ("report", pa.dictionary(pa.int32(), pa.string())),      # few distinct values -> dictionary encoded
+        ("row_key", pa.string()),
+        ("email", pa.string()),
+        ("entry_date", pa.date32()),
+        ("amount", pa.decimal128(_amount_field.max_digits, _amount_field.decimal_places)),
+        ("notes", pa.string()),
+        ("version", pa.int64()),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def _record_batch(pa, schema, chunk):
+    columns = list(zip(*chunk))
+    arrays = [pa.array(columns[0], type=pa.string()).dictionary_encode()]
+    arrays += [pa.array(values, type=field.type) for values, field in zip(columns[1:], list(schema)[1:])]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def iter_entries_arrow(queryset, chunk_size=10000):
+    """
+    yields `queryset` as an Arrow IPC stream, one record batch per `chunk_size` rows, so rows go from
+        the db cursor into columnar buffers without building a dict per row.
+        pyarrow is imported here so the rest of the app doesn't pay for importing it
+    """
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, schema) as writer:
+        yield _drain(buffer)        # schema message
+        for chunk in chunked(_export_rows(queryset, chunk_size), chunk_size):
+            writer.write_batch(_record_batch(pa, schema, chunk))
+            yield _drain(buffer)
+    yield _drain(buffer)            # end of stream marker
+
+
+def write_entries_parquet(queryset, file, chunk_size=10000):
+    """
+    write `queryset` to `file` as Parquet (a row group per chunk). Parquet needs its footer at the end,
+        so unlike the Arrow stream it's written to a (temporary) file first
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    with pq.ParquetWriter(file, schema, compression="zstd") as writer:
+        for chunk in chunked(_export_rows(queryset, chunk_size), chunk_size):
+            writer.write_batch(_record_batch(pa, schema, chunk))
+    return file
+
@@ -20,3 +20,11 @@ class ProfileForm(forms.ModelForm):
         tz = self.cleaned_data["timezone"]
         ZoneInfo(tz)  # raises if invalid
         return tz
+
+
+class GrantImportForm(forms.Form):
+    """admin upload of access grants, see core.grants"""
+    file = forms.FileField(
+        help_text="columns: username, report (slug), role, expires_at (ISO datetime, UTC unless it has an offset)"
+    )
+    format = forms.ChoiceField(choices=[("csv", "CSV"), ("jsonl", "JSON lines")], initial="csv")
@@ -0,0 +1,179 @@
+# core/grants.py
+"""
+Bulk import/export of report access grants (UserReportAccess rows).
+
+Files are CSV (with a header) or JSON lines with the columns in GRANT_FIELDS, `report` is the report slug
+and `expires_at` an ISO datetime or empty (taken as UTC when it has no offset, whoever uploads it).
+Both directions stream in chunks so memory use stays flat no matter how many grants a file holds.
+"""
+import csv
+import io
+import json
+from datetime import timezone as dt_timezone
+from itertools import islice
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import access_changed
+from .models import Report, User, UserDeadline, UserReportAccess
+
+GRANT_FIELDS = ("username", "report", "role", "expires_at")
+FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+ROLES = {role for role, _ in UserReportAccess.ROLE_CHOICES}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# ---------- import ----------
+def read_rows(stream, fmt):
+    """
+    (line number, dict) per grant from a text stream, numbered like an editor/spreadsheet (CSV header = line 1).
+        a JSONL line that isn't a JSON object comes through as (line number, ValueError) so the importer
+        can report it with the other invalid rows; values are strings (or None) like CSV cells
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield number, _json_row(line)
+    else:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+def _json_row(line):
+    try:
+        row = json.loads(line)
+    except ValueError as exc:
+        return ValueError(f"invalid JSON: {exc}")
+    if not isinstance(row, dict):
+        return ValueError(f"expected a JSON object, got {type(row).__name__}")
+    return {key: value if value is None or isinstance(value, str) else json.dumps(value) for key, value in row.items()}
+
+
+class GrantImporter:
+    """
+    upserts grants chunk by chunk against the uniqe_user_report_access constraint.
+        users and reports are resolved through lookup dicts that only query names they haven't seen yet,
+        rows that can't be resolved/validated are collected in `errors` as (line number, message)
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.users = {}         # username -> user id
+        self.reports = {}       # slug -> Report
+        self.imported = 0
+        self.errors = []
+
+    def run(self, rows):
+        """import (line number, dict) pairs as read_rows() yields them"""
+        for chunk in chunked(rows, self.chunk_size):
+            self.import_chunk(chunk)
+        return self
+
+    def resolve(self, chunk):
+        chunk = [(line, row) for line, row in chunk if isinstance(row, dict)]
+        usernames = {row.get("username") for _, row in chunk} - self.users.keys()
+        if usernames:
+            self.users.update(User.objects.filter(username__in=usernames).values_list("username", "pk"))
+        slugs = {row.get("report") for _, row in chunk} - self.reports.keys()
+        if slugs:
+            self.reports.update(
+                (r.slug, r)
+                for r in Report.objects.filter(slug__in=slugs).only(
+                    "slug", "cadence", "day_of_week_deadline", "day_of_month_deadline", "recurrence_rule",
+                    "time_deadline",
+                )
+            )
+
+    def parse(self, row):
+        """UserReportAccess for one row, raises ValueError with a readable message"""
+        if isinstance(row, ValueError):
+            raise row
+        user_id = self.users.get(row.get("username"))
+        if user_id is None:
+            raise ValueError(f"unknown user {row.get('username')!r}")
+        report = self.reports.get(row.get("report"))
+        if report is None:
+            raise ValueError(f"unknown report {row.get('report')!r}")
+
+        role = row.get("role") or "edit"
+        if role not in ROLES:
+            raise ValueError(f"invalid role {role!r}")
+
+        expires_at = row.get("expires_at") or None
+        if expires_at:
+            expires_at = parse_datetime(expires_at)
+            if expires_at is None:
+                raise ValueError(f"invalid expires_at {row.get('expires_at')!r}")
+            if timezone.is_naive(expires_at):
+                # not the active time zone: that's the uploader's in the admin and UTC on the command line
+                expires_at = timezone.make_aware(expires_at, dt_timezone.utc)
+
+        return UserReportAccess(user_id=user_id, report=report, role=role, expires_at=expires_at)
+
+    def import_chunk(self, chunk):
+        self.resolve(chunk)
+
+        accesses = {}       # one row per (user, report), the last one in the chunk wins
+        for line, row in chunk:
+            try:
+                access = self.parse(row)
+            except ValueError as exc:
+                self.errors.append((line, str(exc)))
+                continue
+            accesses[(access.user_id, access.report_id)] = access
+        if not accesses:
+            return
+
+        saved = UserReportAccess.objects.bulk_create(
+            accesses.values(),
+            update_conflicts=True,
+            unique_fields=["user", "report"],
+            update_fields=["role", "expires_at"],
+        )
+        self.imported += len(saved)
+
+        # bulk_create skips signals, so keep deadlines and caches in sync by hand
+        UserDeadline.objects.sync_accesses(saved)
+        for user_id in {a.user_id for a in saved}:
+            access_changed(user_id)
+
+
+# ---------- export ----------
+def iter_grants(queryset, fmt, chunk_size=2000):
+    """yields the grants in `queryset` as CSV/JSONL text, reading the table with iterator(chunk_size=...)"""
+    rows = (
+        queryset
+        .order_by("pk")
+        .values_list("user__username", "report__slug", "role", "expires_at")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(GRANT_FIELDS)
+        for chunk in chunked(rows, chunk_size):
+            writer.writerows((u, r, role, exp.isoformat() if exp else "") for u, r, role, exp in chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    elif fmt == "jsonl":
+        for chunk in chunked(rows, chunk_size):
+            yield "".join(
+                json.dumps(dict(zip(GRANT_FIELDS, (u, r, role, exp.isoformat() if exp else None)))) + "\n"
+                for u, r, role, exp in chunk
+            )
+    else:
+        raise ValueError(f"unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
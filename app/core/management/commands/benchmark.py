@@ -0,0 +1,222 @@
+# core/management/commands/benchmark.py
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from core.models import Report, User, UserReportAccess, compute_next_deadlines
+
+from .seed_benchmark import ADMIN_USERNAME, USER_PREFIX
+
+
+# regression limits, about 4x the cold cache numbers on a laptop with the small seed the benchmark tests use
+# (core.tests.BenchmarkTests, `CORE_BENCHMARKS=1 manage.py test core --tag benchmark`) or `--check` here
+LIMITS_MS = {       # url name -> (p50, p99)
+    "home": (50, 200),
+    "my_reports": (60, 200),
+    "admin_report_list": (50, 150),
+    "admin_report_detail": (50, 150),
+    "admin:core_userreportaccess_changelist": (400, 1000),     # mostly the stock admin template, 100 rows
+}
+DEADLINE_LIMIT_US = 50      # Report.next_deadline_est() per call
+
+
+def over_limits(results):
+    """["name: p50 60.1 ms > 50 ms", ...] for the measured views/deadlines that are over LIMITS_MS/DEADLINE_LIMIT_US"""
+    over = []
+    for name, stats in results.get("views", {}).items():
+        for key, limit in zip(("p50_ms", "p99_ms"), LIMITS_MS.get(name, ())):
+            if stats[key] >= limit:
+                over.append(f"{name}: {key[:3]} {stats[key]} ms >= {limit} ms")
+    per_call = results.get("deadlines", {}).get("next_deadline_est_us")
+    if per_call is not None and per_call >= DEADLINE_LIMIT_US:
+        over.append(f"next_deadline_est: {per_call} us >= {DEADLINE_LIMIT_US} us")
+    return over
+
+
+def percentile(values, pct):
+    """nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and p50/p99 latency of the core views through the django test client, "
+        "their template render time with and without the fragment cache, plus a microbenchmark of the "
+        "deadline computation, and write the results as JSON so runs can "
+        "be compared across commits. Seed data first with `manage.py seed_benchmark`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="requests per view")
+        parser.add_argument("--users", type=int, default=20, help="distinct seeded users to log in as")
+        parser.add_argument("--cold", action="store_true", help="clear the cache before every request")
+        parser.add_argument("--iterations", type=int, default=10000, help="deadline microbenchmark iterations")
+        parser.add_argument("--output", default="bench_output.json", help="where to write the JSON results")
+        parser.add_argument("--check", action="store_true", help="fail if a result is over LIMITS_MS/DEADLINE_LIMIT_US")
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by("pk")[: options["users"]])
+        admin = User.objects.filter(username=ADMIN_USERNAME).first()
+        report = Report.objects.filter(user_links__isnull=False).order_by("pk").first()
+        if not users or admin is None or report is None:
+            raise CommandError("no benchmark data, run `manage.py seed_benchmark` first")
+
+        results = {
+            "timestamp": datetime.now(dt_timezone.utc).isoformat(),
+            "commit": self.git_commit(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": settings.DATABASES["default"]["ENGINE"],
+            "data": {
+                "users": User.objects.count(),
+                "reports": Report.objects.count(),
+                "access_links": UserReportAccess.objects.count(),
+            },
+            "options": {k: options[k] for k in ("requests", "users", "cold", "iterations")},
+            "views": {},
+        }
+
+        user_views = {
+            "home": reverse("home"),
+            "my_reports": reverse("my_reports"),
+        }
+        admin_views = {
+            "admin_report_list": reverse("admin_report_list"),
+            "admin_report_detail": reverse("admin_report_detail", args=[report.slug]),
+        }
+        clients = [self.client_for(u) for u in users]
+        admin_clients = [self.client_for(admin)]
+
+        for name, url in user_views.items():
+            results["views"][name] = self.bench_view(clients, url, options)
+            self.report(name, results["views"][name])
+        for name, url in admin_views.items():
+            results["views"][name] = self.bench_view(admin_clients, url, options)
+            self.report(name, results["views"][name])
+
+        results["templates"] = {}
+        for name, url in user_views.items():
+            results["templates"][name] = self.bench_templates(clients, url, options["requests"])
+            self.stdout.write(f"{name:<22} render {results['templates'][name]}")
+
+        results["deadlines"] = self.bench_deadlines(options["iterations"])
+        self.stdout.write(f"deadlines: {results['deadlines']}")
+
+        with open(options["output"], "w") as fh:
+            json.dump(results, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"results written to {options['output']}"))
+
+        if options["check"]:
+            over = over_limits(results)
+            if over:
+                raise CommandError("over the benchmark limits:\n" + "\n".join(over))
+
+    def client_for(self, user):
+        # talk to a host from ALLOWED_HOSTS so the requests go through unchanged settings
+        host = next((h for h in settings.ALLOWED_HOSTS if h != "*" and not h.startswith(".")), "localhost")
+        client = Client(HTTP_HOST=host)
+        client.force_login(user)
+        return client
+
+    def bench_view(self, clients, url, options):
+        latencies = []
+        # warm up each client once (session, connection, template loading)
+        for client in clients:
+            client.get(url, secure=True)
+
+        started = time.perf_counter()
+        for i in range(options["requests"]):
+            if options["cold"]:
+                cache.clear()
+            client = clients[i % len(clients)]
+            t0 = time.perf_counter()
+            response = client.get(url, secure=True)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                raise CommandError(f"{url} returned {response.status_code}")
+        return summarize(latencies, time.perf_counter() - started)
+
+    def bench_templates(self, clients, url, requests):
+        """
+        template render time (the tpl entry of the Server-Timing header) with the cache cleared before
+            every request vs with the report table fragments already cached
+        """
+        if not settings.CORE_SERVER_TIMING:
+            return {}
+
+        def render_ms(client):
+            timing = client.get(url, secure=True)["Server-Timing"]
+            return float(timing.split("tpl;dur=", 1)[1].split(",", 1)[0])
+
+        uncached, cached = [], []
+        for i in range(requests):
+            client = clients[i % len(clients)]
+            cache.clear()
+            uncached.append(render_ms(client))
+            cached.append(render_ms(client))
+        uncached.sort()
+        cached.sort()
+        return {
+            "uncached_p50_ms": percentile(uncached, 50),
+            "uncached_p99_ms": percentile(uncached, 99),
+            "fragment_cached_p50_ms": percentile(cached, 50),
+            "fragment_cached_p99_ms": percentile(cached, 99),
+        }
+
+    def bench_deadlines(self, iterations):
+        reports = list(Report.objects.filter(time_deadline__isnull=False).select_related("time_deadline")[:500])
+        if not reports:
+            return {}
+
+        t0 = time.perf_counter()
+        for i in range(iterations):
+            reports[i % len(reports)].next_deadline_est()
+        single = (time.perf_counter() - t0) / iterations
+
+        rounds = max(1, iterations // len(reports))
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            compute_next_deadlines(reports)
+        batch = (time.perf_counter() - t0) / (rounds * len(reports))
+
+        return {
+            "next_deadline_est_us": round(single * 1e6, 3),
+            "compute_next_deadlines_per_report_us": round(batch * 1e6, 3),
+            "batch_size": len(reports),
+        }
+
+    def report(self, name, stats):
+        self.stdout.write(
+            f"{name:<22} {stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms"
+        )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,144 @@
+# core/management/commands/benchmark_sqlite.py
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from core.models import Report, UserProfile, UserReportAccess
+
+from .benchmark import summarize
+from .seed_benchmark import USER_PREFIX
+
+PROFILES = {
+    "default": {},
+    "tuned": settings.SQLITE_TUNED_OPTIONS,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent write throughput of the default sqlite settings with the SQLITE_TUNED profile "
+        "(WAL, synchronous=NORMAL, mmap, BEGIN IMMEDIATE). Each profile runs the same mix of profile saves, "
+        "grant upserts and dashboard reads from several threads against its own copy of the database, "
+        "the configured database itself isn't written. Seed data first with `manage.py seed_benchmark`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5, help="run time per profile")
+        parser.add_argument("--write-share", type=float, default=0.5, help="share of operations that write")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES["default"]
+        if source["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("benchmark_sqlite needs the sqlite database")
+
+        user_ids = list(
+            UserProfile.objects.filter(user__username__startswith=USER_PREFIX).values_list("user_id", flat=True)[:500]
+        )
+        report_ids = list(Report.objects.values_list("pk", flat=True)[:500])
+        if not user_ids or len(report_ids) < 5:
+            raise CommandError("no benchmark data, run `manage.py seed_benchmark` first")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            results = {}
+            for name, db_options in PROFILES.items():
+                alias = f"bench_sqlite_{name}"
+                path = Path(tmp) / f"{name}.sqlite3"
+                self.copy_database(source["NAME"], path)
+                connections.settings[alias] = {
+                    **connections.settings["default"], "NAME": str(path), "OPTIONS": dict(db_options),
+                }
+                try:
+                    results[name] = self.run_profile(alias, user_ids, report_ids, options)
+                finally:
+                    connections[alias].close()
+                self.report(name, results[name])
+
+        default, tuned = results["default"]["throughput_rps"], results["tuned"]["throughput_rps"]
+        if default:
+            self.stdout.write(self.style.SUCCESS(f"tuned/default throughput: {tuned / default:.2f}x"))
+
+    def copy_database(self, source, target):
+        """consistent copy through the backup api, reset to the rollback journal like a fresh file"""
+        src, dst = sqlite3.connect(source), sqlite3.connect(target)
+        try:
+            src.backup(dst)
+            dst.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            src.close()
+            dst.close()
+
+    def run_profile(self, alias, user_ids, report_ids, options):
+        latencies, locked = [], [0]
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["seconds"]
+
+        def worker(seed):
+            rng = random.Random(seed)
+            mine, errors = [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    t0 = time.perf_counter()
+                    try:
+                        self.operation(alias, rng, user_ids, report_ids, options["write_share"])
+                    except OperationalError as exc:
+                        if "locked" not in str(exc):
+                            raise
+                        errors += 1
+                        continue
+                    mine.append(time.perf_counter() - t0)
+            finally:
+                connections[alias].close()      # connections are per thread
+            with lock:
+                latencies.extend(mine)
+                locked[0] += errors
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(options["seed"] + i,)) for i in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = summarize(latencies, time.perf_counter() - started) if latencies else {"requests": 0, "throughput_rps": 0}
+        stats["locked_errors"] = locked[0]
+        return stats
+
+    def operation(self, alias, rng, user_ids, report_ids, write_share):
+        """one unit of work: a settings save (read then write), a grant upsert or a dashboard read"""
+        user_id = rng.choice(user_ids)
+        roll = rng.random()
+        if roll < write_share / 2:
+            with transaction.atomic(using=alias):
+                profile = UserProfile.objects.using(alias).get(user_id=user_id)
+                profile.location = rng.choice([loc for loc, _ in UserProfile.LOCATION_CHOICES])
+                profile.save(using=alias)
+        elif roll < write_share:
+            with transaction.atomic(using=alias):
+                UserReportAccess.objects.using(alias).bulk_create(
+                    [UserReportAccess(user_id=user_id, report_id=r, role=rng.choice(["view", "edit"]))
+                     for r in rng.sample(report_ids, 5)],
+                    update_conflicts=True,
+                    unique_fields=["user", "report"],
+                    update_fields=["role"],
+                )
+        else:
+            list(
+                UserReportAccess.objects.using(alias)
+                .filter(user_id=user_id)
+                .select_related("report", "report__time_deadline")[:50]
+            )
+
+    def report(self, name, stats):
+        self.stdout.write(
+            f"{name:<8} {stats['throughput_rps']:>8} ops/s  p50 {stats.get('p50_ms')} ms  "
+            f"p99 {stats.get('p99_ms')} ms  locked errors {stats['locked_errors']}"
+        )
@@ -0,0 +1,31 @@
+# core/management/commands/export_grants.py
+from django.core.management.base import BaseCommand
+
+from core.grants import FORMATS, iter_grants
+from core.models import UserReportAccess
+
+
+class Command(BaseCommand):
+    help = "Write report access grants as CSV/JSONL (same columns import_grants reads), streamed in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", default="-", help="file to write, - for stdout")
+        parser.add_argument("--report", help="only grants for this report slug")
+        parser.add_argument("--user", help="only grants for this username")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        qs = UserReportAccess.objects.all()
+        if options["report"]:
+            qs = qs.filter(report__slug=options["report"])
+        if options["user"]:
+            qs = qs.filter(user__username=options["user"])
+
+        chunks = iter_grants(qs, options["format"], chunk_size=options["chunk_size"])
+        if options["output"] == "-":
+            for text in chunks:
+                self.stdout.write(text, ending="")
+        else:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(chunks)
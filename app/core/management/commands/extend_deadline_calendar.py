@@ -0,0 +1,36 @@
+# core/management/commands/extend_deadline_calendar.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import DeadlineOccurrence
+
+
+class Command(BaseCommand):
+    help = (
+        "Extend the DeadlineOccurrence calendar to the rolling horizon. Only occurrences past each report's "
+        "last generated one are added, reports whose schedule changed get their upcoming occurrences "
+        "regenerated. Run daily (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.CORE_DEADLINE_HORIZON_DAYS, help="horizon in days from now"
+        )
+        parser.add_argument(
+            "--keep-days", type=int, default=None, help="also delete occurrences older than this many days"
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        result = DeadlineOccurrence.objects.extend(options["days"], from_dt=now, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"created {result['created']} occurrences, regenerated {result['regenerated']} changed schedules"
+        ))
+
+        if options["keep_days"] is not None:
+            pruned = DeadlineOccurrence.objects.prune(now - timedelta(days=options["keep_days"]))
+            self.stdout.write(self.style.SUCCESS(f"deleted {pruned} old occurrences"))
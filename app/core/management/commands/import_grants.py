@@ -0,0 +1,41 @@
+# core/management/commands/import_grants.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.grants import FORMATS, GrantImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update report access grants from a CSV/JSONL file with the columns "
+        "username, report (slug), role, expires_at (UTC unless it has an offset). The file is read and "
+        "upserted in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, - for stdin")
+        parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension, csv for stdin")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+
+        importer = GrantImporter(chunk_size=options["chunk_size"])
+        if path == "-":
+            importer.run(read_rows(sys.stdin, fmt))
+        else:
+            try:
+                with open(path, newline="", encoding="utf-8") as stream:
+                    importer.run(read_rows(stream, fmt))
+            except OSError as exc:
+                raise CommandError(exc)
+            except UnicodeDecodeError:
+                raise CommandError(f"{path} isn't UTF-8, stopped after {importer.imported} grants") from None
+
+        for line, message in importer.errors:
+            self.stderr.write(f"line {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"imported {importer.imported} grants, skipped {len(importer.errors)} invalid rows"
+        ))
@@ -0,0 +1,69 @@
+# core/management/commands/profile_startup.py
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# what a worker does before it can serve the first request: load the app and the url conf
+STARTUP = """
+import os, time
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", {settings_module!r})
+from django.core.{handler} import get_{handler}_application
+application = get_{handler}_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - started)
+"""
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from `python -X importtime` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile worker startup: loads the ASGI/WSGI application and url conf in a fresh interpreter "
+        "under `python -X importtime` and summarizes where the import time goes, per package and for "
+        "the slowest modules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--handler", choices=["asgi", "wsgi"], default="asgi")
+        parser.add_argument("--top", type=int, default=20, help="slowest modules to list")
+        parser.add_argument("--sort", choices=["self", "cumulative"], default="self")
+
+    def handle(self, *args, **options):
+        code = STARTUP.format(settings_module=os.environ["DJANGO_SETTINGS_MODULE"], handler=options["handler"])
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"startup failed:\n{result.stderr[-2000:]}")
+
+        rows = parse_importtime(result.stderr)
+        total = float(result.stdout.strip().splitlines()[-1])
+
+        packages = defaultdict(int)
+        for module, self_us, _ in rows:
+            packages[module.split(".")[0]] += self_us
+        self.stdout.write(f"startup {total * 1000:.1f} ms, {len(rows)} modules imported\n")
+        self.stdout.write("by package (self time):")
+        for package, us in sorted(packages.items(), key=lambda item: -item[1])[: options["top"]]:
+            self.stdout.write(f"  {us / 1000:>8.1f} ms  {package}")
+
+        column = 1 if options["sort"] == "self" else 2
+        self.stdout.write(f"\nslowest modules ({options['sort']} time):")
+        for row in sorted(rows, key=lambda row: -row[column])[: options["top"]]:
+            self.stdout.write(f"  {row[1] / 1000:>8.1f} ms self  {row[2] / 1000:>8.1f} ms cumulative  {row[0]}")
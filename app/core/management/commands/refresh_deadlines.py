@@ -0,0 +1,37 @@
+# core/management/commands/refresh_deadlines.py
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.cache import bump_version
+from core.models import Report, UserDeadline
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the precomputed UserDeadline table current: adds rows for new access links and "
+        "rolls forward deadlines that have passed. Run periodically (every minute, the scheduler service in "
+        "docker-compose), the pages only read the table and leave passed rows out until this runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="recompute every row, not just the ones whose deadline has passed",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        created = UserDeadline.objects.create_missing(now)
+        if options["rebuild"]:
+            updated = UserDeadline.objects.refresh_for_reports(Report.objects.all(), from_dt=now)
+            bump_version("reports")
+        else:
+            # bulk updates skip signals: drop the cached pages of the users whose rows move
+            user_ids = set(UserDeadline.objects.filter(deadline__lt=now).values_list("user_id", flat=True))
+            updated = UserDeadline.objects.roll_forward(now)
+            for user_id in user_ids:
+                bump_version("user", user_id)
+
+        self.stdout.write(self.style.SUCCESS(f"created {created} and updated {updated} deadline rows"))
@@ -0,0 +1,118 @@
+# core/management/commands/seed_benchmark.py
+import random
+from datetime import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import DeadlineOccurrence, Report, TimeSlot, User, UserDeadline, UserProfile, UserReportAccess
+
+USER_PREFIX = "bench_user_"
+REPORT_PREFIX = "bench-report-"
+ADMIN_USERNAME = "bench_admin"
+PASSWORD = "bench-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the database with synthetic users, profiles, reports and access links for benchmarking "
+        "(see `manage.py benchmark`). Everything is bulk inserted and prefixed with bench_ so it can be "
+        "removed again with --flush."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--reports", type=int, default=500)
+        parser.add_argument("--links-per-user", type=int, default=50, help="reports each user can access")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="random seed, same seed -> same data")
+        parser.add_argument("--flush", action="store_true", help="only delete previously seeded data")
+
+    def handle(self, *args, **options):
+        self.flush()
+        if options["flush"]:
+            self.stdout.write(self.style.SUCCESS("removed benchmark data"))
+            return
+
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            slots = self.seed_timeslots()
+            reports = self.seed_reports(options["reports"], slots, rng, batch_size)
+            users = self.seed_users(options["users"], batch_size)
+            links = self.seed_links(users, reports, options["links_per_user"], rng, batch_size)
+            deadlines = UserDeadline.objects.create_missing()
+            occurrences = DeadlineOccurrence.objects.extend(settings.CORE_DEADLINE_HORIZON_DAYS)["created"]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"seeded {len(users)} users, {len(reports)} reports, {links} access links, {deadlines} deadlines, "
+            f"{occurrences} calendar occurrences "
+            f"(admin login: {ADMIN_USERNAME} / {PASSWORD})"
+        ))
+
+    def flush(self):
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+        User.objects.filter(username=ADMIN_USERNAME).delete()
+        Report.objects.filter(slug__startswith=REPORT_PREFIX).delete()
+
+    def seed_timeslots(self):
+        existing = set(TimeSlot.objects.values_list("time", flat=True))
+        TimeSlot.objects.bulk_create(
+            TimeSlot(time=time(h, m)) for h in range(24) for m in (0, 30) if time(h, m) not in existing
+        )
+        return list(TimeSlot.objects.all())
+
+    def seed_reports(self, count, slots, rng, batch_size):
+        reports = []
+        for i in range(count):
+            cadence = rng.choice(["Daily", "Weekly", "Monthly"])
+            reports.append(Report(
+                name=f"Bench Report {i:05d}",
+                slug=f"{REPORT_PREFIX}{i:05d}",
+                cadence=cadence,
+                day_of_week_deadline=rng.randrange(7) if cadence == "Weekly" else None,
+                day_of_month_deadline=rng.choice([None, 1, 15, 28, 31]) if cadence == "Monthly" else None,
+                time_deadline=rng.choice(slots) if rng.random() > 0.1 else None,    # ~10% without deadline
+            ))
+        return Report.objects.bulk_create(reports, batch_size=batch_size)
+
+    def seed_users(self, count, batch_size):
+        password = make_password(PASSWORD)      # hash once, it's the slow part
+        users = [User(username=ADMIN_USERNAME, password=password, is_staff=True, is_superuser=True)]
+        users += [
+            User(username=f"{USER_PREFIX}{i:06d}", first_name=f"User{i}", password=password)
+            for i in range(count)
+        ]
+        users = User.objects.bulk_create(users, batch_size=batch_size)
+
+        # bulk_create skips the post_save signal that normally creates the profile
+        locations = [choice for choice, _ in UserProfile.LOCATION_CHOICES]
+        UserProfile.objects.bulk_create(
+            (
+                UserProfile(
+                    user=u,
+                    location=locations[i % len(locations)],
+                    timezone=UserProfile.LOCATION_TIMEZONES[locations[i % len(locations)]],
+                )
+                for i, u in enumerate(users)
+            ),
+            batch_size=batch_size,
+        )
+        return users
+
+    def seed_links(self, users, reports, links_per_user, rng, batch_size):
+        links_per_user = min(links_per_user, len(reports))
+        roles = [role for role, _ in UserReportAccess.ROLE_CHOICES]
+        created = 0
+        batch = []
+        for u in users:
+            for report in rng.sample(reports, links_per_user):
+                batch.append(UserReportAccess(user=u, report=report, role=rng.choice(roles)))
+            if len(batch) >= batch_size:
+                created += len(UserReportAccess.objects.bulk_create(batch, batch_size=batch_size))
+                batch = []
+        created += len(UserReportAccess.objects.bulk_create(batch, batch_size=batch_size))
+        return created
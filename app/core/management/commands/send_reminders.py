@@ -0,0 +1,38 @@
+# core/management/commands/send_reminders.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.reminders import drain_outbox, enqueue_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue reminder emails for reports due within the lead time (one outbox row per user, report and "
+        "deadline, so running it again never sends duplicates) and send the pending ones through the "
+        "configured email backend. Run every few minutes (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--within-hours", type=int, default=settings.CORE_REMINDER_LEAD_HOURS,
+            help="remind about deadlines up to this many hours ahead",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="outbox rows sent per batch")
+        parser.add_argument("--workers", type=int, default=8, help="threads sending in parallel")
+        parser.add_argument("--max-attempts", type=int, default=3, help="give up on a reminder after this many failures")
+        parser.add_argument(
+            "--lease-seconds", type=int, default=600,
+            help="how long a claimed batch is reserved for this run, has to cover sending the whole batch",
+        )
+        parser.add_argument("--enqueue-only", action="store_true", help="only queue, don't send")
+        parser.add_argument("--send-only", action="store_true", help="only send what's already queued")
+
+    def handle(self, *args, **options):
+        if not options["send_only"]:
+            queued = enqueue_reminders(options["within_hours"])
+            self.stdout.write(f"queued {queued} reminders")
+        if not options["enqueue_only"]:
+            sent, failed = drain_outbox(
+                options["batch_size"], options["workers"], options["max_attempts"], options["lease_seconds"]
+            )
+            self.stdout.write(self.style.SUCCESS(f"sent {sent} reminders, {failed} failed for good"))
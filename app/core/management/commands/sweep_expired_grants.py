@@ -0,0 +1,84 @@
+# core/management/commands/sweep_expired_grants.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.grants import iter_grants
+from core.models import ArchivedGrant, UserReportAccess
+
+
+class Command(BaseCommand):
+    help = (
+        "Move expired report access grants to the ArchivedGrant table in small chunks (each in its own short "
+        "transaction, so no long locks on the access table), optionally also appending them to a JSONL file. "
+        "Safe to run concurrently: chunks are claimed with SKIP LOCKED and a grant is archived once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--archive", help="also append the grants to this JSONL file (import_grants format)")
+        parser.add_argument("--no-archive", action="store_true", help="only delete, don't keep ArchivedGrant rows")
+        parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between chunks")
+        parser.add_argument("--dry-run", action="store_true", help="only count expired grants")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = UserReportAccess.objects.expired(now)
+
+        if options["dry_run"]:
+            self.stdout.write(f"{expired.count()} expired grants")
+            return
+
+        archive = open(options["archive"], "a", encoding="utf-8") if options["archive"] else None
+        swept = 0
+        try:
+            while True:
+                # walks the partial index on expires_at
+                ids = list(expired.order_by("expires_at").values_list("pk", flat=True)[: options["chunk_size"]])
+                if not ids:
+                    break
+                removed = self.sweep(expired.filter(pk__in=ids), archive, not options["no_archive"])
+                if not removed:
+                    break       # another sweeper holds these rows, the rest is theirs too
+                swept += removed
+
+                if options["pause"]:
+                    time.sleep(options["pause"])
+        finally:
+            if archive:
+                archive.close()
+
+        self.stdout.write(self.style.SUCCESS(f"removed {swept} expired grants"))
+
+    def sweep(self, chunk, archive, keep):
+        """
+        archive and delete one chunk, returns how many grants this run removed.
+            the rows are locked and still have to be expired (someone may have extended one since the ids
+            were read), rows another sweeper holds are skipped; ignore_conflicts on the unique source_id
+            keeps a grant that's archived twice anyway (e.g. sqlite, where there's no row locking) at one row
+        """
+        with transaction.atomic():
+            grants = list(
+                chunk.select_for_update(skip_locked=True, of=("self",)).select_related("user", "report")
+            )
+            if not grants:
+                return 0
+            if keep:
+                ArchivedGrant.objects.bulk_create(
+                    (
+                        ArchivedGrant(
+                            source_id=g.pk, username=g.user.username, report_slug=g.report.slug, role=g.role,
+                            granted_at=g.granted_at, expires_at=g.expires_at,
+                        )
+                        for g in grants
+                    ),
+                    ignore_conflicts=True,
+                )
+            locked = UserReportAccess.objects.filter(pk__in=[g.pk for g in grants])
+            if archive:
+                archive.writelines(iter_grants(locked, "jsonl"))
+                archive.flush()
+            # cascades to UserDeadline, signals drop the users' caches
+            return locked.delete()[1].get(UserReportAccess._meta.label, 0)
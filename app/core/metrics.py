@@ -0,0 +1,192 @@
+# core/metrics.py
+"""
+Per-view request metrics: SQL query count, db time, template render time and total latency.
+
+RequestMetricsMiddleware (core.middleware) starts a RequestMetrics for every request, the query hook
+and TimedDjangoTemplates add to it through a context variable (so it also follows async code), and
+the totals are aggregated per view in this process for the Prometheus endpoint (views.metrics).
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+from django.template.backends.django import DjangoTemplates
+
+# request latency histogram buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar("core_request_metrics", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """a view ran more queries than its CORE_QUERY_BUDGETS entry allows (raised in strict mode)"""
+
+
+class RequestMetrics:
+    """counters for the request currently being handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """value for the Server-Timing response header (durations in ms)"""
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f"tpl;dur={self.template_time * 1000:.1f}, "
+            f"total;dur={self.total_time * 1000:.1f}"
+        )
+
+    def as_dict(self):
+        return {
+            "queries": self.queries,
+            "db_ms": round(self.db_time * 1000, 2),
+            "template_ms": round(self.template_time * 1000, 2),
+            "total_ms": round(self.total_time * 1000, 2),
+        }
+
+
+def start_request():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+# ---------- collection hooks ----------
+def record_query(execute, sql, params, many, context):
+    """execute wrapper installed on every db connection, counts/times queries of the current request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_hook(sender, connection, **kwargs):
+    """connection_created receiver (connected in CoreConfig.ready)"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class _TimedTemplate:
+    """wraps a backend template so top-level render() calls are timed (includes extends/include)"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """the regular django template backend, with render time reported to the request metrics"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+# ---------- per process aggregation ----------
+class _ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+
+_lock = threading.Lock()
+_stats = defaultdict(_ViewStats)
+
+
+def observe(view_name, metrics):
+    with _lock:
+        stats = _stats[view_name]
+        stats.requests += 1
+        stats.queries += metrics.queries
+        stats.db_time += metrics.db_time
+        stats.template_time += metrics.template_time
+        stats.total_time += metrics.total_time
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if metrics.total_time <= bound:
+                stats.buckets[i] += 1
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def render_prometheus():
+    """all aggregated metrics in the prometheus text exposition format (this process only)"""
+    with _lock:
+        snapshot = {name: vars(stats).copy() for name, stats in _stats.items()}
+
+    lines = [
+        "# HELP core_requests_total Requests handled, per view.",
+        "# TYPE core_requests_total counter",
+    ]
+    lines += [f'core_requests_total{{view="{v}"}} {s["requests"]}' for v, s in snapshot.items()]
+
+    lines += [
+        "# HELP core_db_queries_total SQL queries executed, per view.",
+        "# TYPE core_db_queries_total counter",
+    ]
+    lines += [f'core_db_queries_total{{view="{v}"}} {s["queries"]}' for v, s in snapshot.items()]
+
+    lines += [
+        "# HELP core_db_seconds_total Time spent in SQL queries, per view.",
+        "# TYPE core_db_seconds_total counter",
+    ]
+    lines += [f'core_db_seconds_total{{view="{v}"}} {s["db_time"]:.6f}' for v, s in snapshot.items()]
+
+    lines += [
+        "# HELP core_template_seconds_total Time spent rendering templates, per view.",
+        "# TYPE core_template_seconds_total counter",
+    ]
+    lines += [f'core_template_seconds_total{{view="{v}"}} {s["template_time"]:.6f}' for v, s in snapshot.items()]
+
+    lines += [
+        "# HELP core_request_duration_seconds Total request latency, per view.",
+        "# TYPE core_request_duration_seconds histogram",
+    ]
+    for v, s in snapshot.items():
+        lines += [
+            f'core_request_duration_seconds_bucket{{view="{v}",le="{bound}"}} {count}'
+            for bound, count in zip(LATENCY_BUCKETS, s["buckets"])
+        ]
+        lines.append(f'core_request_duration_seconds_bucket{{view="{v}",le="+Inf"}} {s["requests"]}')
+        lines.append(f'core_request_duration_seconds_sum{{view="{v}"}} {s["total_time"]:.6f}')
+        lines.append(f'core_request_duration_seconds_count{{view="{v}"}} {s["requests"]}')
+
+    return "\n".join(lines) + "\n"
@@ -1,20 +1,132 @@
 # core/middleware.py
+import logging
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.utils import timezone
-from zoneinfo import ZoneInfo
+
+from . import metrics
+from .cache import aget_profile, get_profile
+from .models import get_zoneinfo
+
+logger = logging.getLogger(__name__)  # use module name for clarity
 
 DEFAULT_TZ = "America/New_York"
 
 class UserTimezoneMiddleware:
+    """
+    activates the user's time zone and attaches their profile as `request.profile` (None if missing).
+        the profile comes from the cache (invalidated in core.signals) so views can reuse it
+        instead of querying UserProfile again.
+        under ASGI the user is resolved with request.auser() and assigned back to request.user,
+        so sync code running on the event loop (templates, decorators) never has to query for it;
+        under WSGI it's the other way round, request.auser() hands async views the user request.user loaded
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         tz_name = None
+        request.profile = None
+        user = request.user
+
+        async def auser():
+            return user
+        request.auser = auser
 
         # if user has a profile, set time zone from profile
-        if request.user.is_authenticated and hasattr(request.user, "profile"):
-            tz_name = request.user.profile.timezone or DEFAULT_TZ
-        timezone.activate(ZoneInfo(tz_name or DEFAULT_TZ))
+        if user.is_authenticated:
+            request.profile = get_profile(user)
+            if request.profile is not None:
+                tz_name = request.profile.timezone or DEFAULT_TZ
+        timezone.activate(get_zoneinfo(tz_name or DEFAULT_TZ))
         response = self.get_response(request)
         timezone.deactivate()
         return response
+
+    async def __acall__(self, request):
+        tz_name = None
+        request.profile = None
+
+        user = await request.auser()
+        request.user = user
+        if user.is_authenticated:
+            request.profile = await aget_profile(user)
+            if request.profile is not None:
+                tz_name = request.profile.timezone or DEFAULT_TZ
+        timezone.activate(get_zoneinfo(tz_name or DEFAULT_TZ))
+        response = await self.get_response(request)
+        timezone.deactivate()
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    records query count, db time, template render time and total latency for every request.
+        - adds a Server-Timing header (CORE_SERVER_TIMING)
+        - aggregates per view for the prometheus endpoint (see core.metrics)
+        - logs a sampled "request timing" event (CORE_TIMING_SAMPLE_RATE)
+        - checks CORE_QUERY_BUDGETS {url name: max queries}, raising QueryBudgetExceeded
+          when CORE_QUERY_BUDGET_STRICT is on (tests) and logging a warning otherwise
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request_metrics, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.process_metrics(request, request_metrics, response)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.process_metrics(request, request_metrics, response)
+
+    def process_metrics(self, request, request_metrics, response):
+        request_metrics.finish()
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "unresolved"
+        metrics.observe(view_name, request_metrics)
+
+        if getattr(settings, "CORE_SERVER_TIMING", True):
+            response["Server-Timing"] = request_metrics.server_timing()
+
+        sample_rate = getattr(settings, "CORE_TIMING_SAMPLE_RATE", 0.0)
+        if sample_rate and random.random() < sample_rate:
+            logger.info(
+                "request timing",
+                extra={"view": view_name, "status": response.status_code, **request_metrics.as_dict()},
+            )
+
+        budget = getattr(settings, "CORE_QUERY_BUDGETS", {}).get(view_name)
+        if budget is not None and request_metrics.queries > budget:
+            message = f"{view_name} ran {request_metrics.queries} queries (budget {budget})"
+            if getattr(settings, "CORE_QUERY_BUDGET_STRICT", False):
+                raise metrics.QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
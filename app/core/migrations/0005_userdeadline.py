@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_timeslot_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDeadline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deadline', models.DateTimeField(blank=True, null=True)),
+                ('access', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='user_deadline', to='core.userreportaccess')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_deadlines', to='core.report')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_deadlines', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'deadline'], name='core_userde_user_id_fa71e0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_userdeadline'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userreportaccess',
+            index=models.Index(fields=['user', 'expires_at'], name='access_user_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userreportaccess',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False)), fields=['expires_at'], name='access_expiring_idx'),
+        ),
+    ]
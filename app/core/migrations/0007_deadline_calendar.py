@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:29
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_access_expiry_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='day_of_month_deadline',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Monthly reports: day of the month (moved to the last day in shorter months), empty = last day.', null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(31)]),
+        ),
+        migrations.CreateModel(
+            name='DeadlineOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField()),
+                ('schedule_key', models.CharField(max_length=64)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='core.report')),
+            ],
+            options={
+                'ordering': ['due_at'],
+                'indexes': [models.Index(fields=['due_at', 'report'], name='occurrence_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('report', 'due_at'), name='unique_report_occurrence')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_reminder_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_key', models.CharField(max_length=64)),
+                ('entry_date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='core.report')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['report', 'row_key'],
+                'indexes': [models.Index(fields=['report', 'user'], name='entry_report_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('report', 'row_key'), name='unique_report_entry_key')],
+            },
+        ),
+    ]
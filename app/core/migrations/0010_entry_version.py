@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_report_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportentry',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
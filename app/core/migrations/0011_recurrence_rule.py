@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:46
+
+import core.recurrence
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_entry_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='recurrence_rule',
+            field=models.CharField(blank=True, help_text='Custom reports: which days the report is due, e.g. FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1 (last business day) or FREQ=MONTHLY;BYDAY=2TU (second Tuesday). See core/recurrence.py.', max_length=200, validators=[core.recurrence.validate_rule]),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='cadence',
+            field=models.CharField(choices=[('Daily', 'Daily'), ('Weekly', 'Weekly'), ('Monthly', 'Monthly'), ('Custom', 'Custom')], max_length=20),
+        ),
+    ]
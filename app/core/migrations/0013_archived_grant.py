@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_reminder_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGrant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_id', models.BigIntegerField(unique=True)),
+                ('username', models.CharField(max_length=150)),
+                ('report_slug', models.CharField(max_length=200)),
+                ('role', models.CharField(choices=[('view', 'View'), ('edit', 'Edit'), ('owner', 'Owner')], max_length=10)),
+                ('granted_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['archived_at'],
+            },
+        ),
+    ]
@@ -1,14 +1,25 @@
 from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models import Case, Exists, F, Max, OuterRef, Q, Value, When
+from django.db.models.functions import Coalesce, ExtractHour, ExtractMinute, Least
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from django.utils import timezone
+from django.utils.text import slugify
 
 from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from calendar import monthrange
+from functools import lru_cache
+import hashlib
 import logging
 
+from .recurrence import compile_rule, validate_rule
+
 logger = logging.getLogger(__name__)  # use module name for clarity
 
 
@@ -23,9 +34,206 @@ User = get_user_model()
 REPORT_TIME_ZONE = ZoneInfo("America/New_York")        # dst safe
 # ----------------------------------------------------------------------
 
+
+@lru_cache(maxsize=64)
+def get_zoneinfo(name):
+    """ZoneInfo for a time zone name, cached per process"""
+    return ZoneInfo(name)
+
 # Create your models here
 
 
+# ---------- Deadline rule (shared by the single report and batch paths) ----------
+def _month_day(year, month, day_of_month):
+    """the deadline day in a month: `day_of_month` clamped to the month's length, None = last day"""
+    last = monthrange(year, month)[1]
+    return min(day_of_month or last, last)
+
+
+def _next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _recurrence(rule):
+    """compiled recurrence rule, None for a blank/invalid one (e.g. written with bulk_create, skipping validation)"""
+    try:
+        return compile_rule(rule) if rule else None
+    except ValueError:
+        return None
+
+
+def _next_deadline(now_est, cadence, day_of_week, deadline_time, day_of_month=None, rule=None):
+    """
+    next deadline in REPORT_TIME_ZONE for one schedule, `now_est` must already be in REPORT_TIME_ZONE.
+        None for a Custom schedule whose rule is invalid or never matches
+    """
+    if cadence == "Custom":
+        recurrence = _recurrence(rule)
+        return recurrence.next_after(now_est, deadline_time) if recurrence else None
+
+    base_today = now_est.replace(hour=deadline_time.hour, minute=deadline_time.minute, second=0, microsecond=0)
+
+    if cadence == "Monthly":
+        candidate = base_today.replace(day=_month_day(now_est.year, now_est.month, day_of_month))
+        if now_est > candidate:
+            year, month = _next_month(now_est.year, now_est.month)
+            candidate = base_today.replace(year=year, month=month, day=_month_day(year, month, day_of_month))
+        return candidate
+
+    if cadence == "Weekly" and day_of_week is not None:
+        delta = (int(day_of_week) - now_est.weekday()) % 7
+        candidate = base_today + timedelta(days=delta)
+        if delta == 0 and now_est > candidate:
+            candidate += timedelta(days=7)
+        return candidate
+
+    # Daily (or fallback)
+    return base_today if now_est <= base_today else base_today + timedelta(days=1)
+
+
+def compute_next_deadlines(reports, from_dt=None, tz=None):
+    """
+    Batch version of Report.next_deadline_est() for a whole list of reports.
+        Each report goes through the same per-report rule (_next_deadline), the batch part is resolving
+        every time_deadline in one query instead of one per report, and converting to `tz` once per report.
+
+        Sets on each report (and returns them as a list):
+            - next_deadline: aware datetime in `tz` (name or tzinfo, default REPORT_TIME_ZONE), None if no deadline
+            - seconds_until_deadline: whole seconds from `from_dt` until the deadline (None if no deadline)
+            - is_overdue: True once the deadline has been reached
+    """
+    reports = list(reports)
+    now = from_dt or timezone.now()
+    now_est = now.astimezone(REPORT_TIME_ZONE)
+    out_tz = get_zoneinfo(tz) if isinstance(tz, str) else (tz or REPORT_TIME_ZONE)
+
+    # resolve deadline times without touching report.time_deadline (one query for all slots, not one per report)
+    slot_times = {}
+    missing = set()
+    for r in reports:
+        if r.time_deadline_id is None:
+            continue
+        if Report.time_deadline.is_cached(r):
+            slot_times[r.time_deadline_id] = r.time_deadline.time
+        else:
+            missing.add(r.time_deadline_id)
+    missing -= slot_times.keys()
+    if missing:
+        slot_times.update(TimeSlot.objects.filter(pk__in=missing).values_list("pk", "time"))
+
+    for r in reports:
+        deadline = None
+        if r.time_deadline_id is not None:
+            deadline = _next_deadline(
+                now_est, r.cadence, r.day_of_week_deadline, slot_times[r.time_deadline_id],
+                r.day_of_month_deadline, r.recurrence_rule,
+            )
+        if deadline is None:
+            r.next_deadline, r.seconds_until_deadline, r.is_overdue = None, None, False
+            continue
+        r.next_deadline = deadline.astimezone(out_tz)
+        r.seconds_until_deadline = int((deadline - now).total_seconds())
+        r.is_overdue = r.seconds_until_deadline <= 0
+
+    return reports
+
+
+def with_current_deadlines(rows, from_dt=None, tz=None):
+    """
+    sets `deadline` on rows with their `report` loaded (UserDeadline / UserReportAccess) to the report's
+        next deadline computed now, in `tz`. nothing is written: it's the fallback pages use for stored
+        deadlines that passed before refresh_deadlines rolled them forward (or that don't exist yet)
+    """
+    rows = list(rows)
+    compute_next_deadlines([row.report for row in rows], from_dt=from_dt, tz=tz)
+    for row in rows:
+        row.deadline = row.report.next_deadline
+    return rows
+
+
+def _wall_clock_offset(start_est, end):
+    """REPORT_TIME_ZONE wall clock seconds between `start_est` and `end` (what deadline_offset is measured in)"""
+    end_est = end.astimezone(REPORT_TIME_ZONE)
+    return (end_est.replace(tzinfo=None) - start_est.replace(tzinfo=None)).total_seconds()
+
+
+class ReportQuerySet(models.QuerySet):
+    def with_next_deadlines(self, from_dt=None, tz=None):
+        """evaluate the queryset and attach next deadlines to every report, see compute_next_deadlines()"""
+        return compute_next_deadlines(self, from_dt=from_dt, tz=tz)
+
+    def with_deadline_offset(self, from_dt=None):
+        """
+        Annotate `deadline_offset`: seconds from `from_dt` until the next deadline, computed by the database.
+            Same Daily/Weekly/Monthly rule as Report.next_deadline_est(), written as SQL expressions (SQLite +
+            Postgres) so ordering, filtering and pagination can happen in the query instead of in python.
+            Month lengths are worked out in python and passed in as parameters, and so are the days until
+            the next match of every Custom recurrence rule in use (core.cache.custom_rules(), cached until a
+            report changes).
+
+            The offset is measured on the REPORT_TIME_ZONE wall clock, so across a DST change it can be off
+            from the real duration by the DST shift. Ordering is unaffected; use compute_next_deadlines()
+            on the rows you display for exact datetimes. NULL for reports without a time_deadline.
+        """
+        now_est = (from_dt or timezone.now()).astimezone(REPORT_TIME_ZONE)
+        now_seconds = now_est.hour * 3600 + now_est.minute * 60 + now_est.second + now_est.microsecond / 1e6
+
+        deadline_seconds = ExtractHour("time_deadline__time") * 3600 + ExtractMinute("time_deadline__time") * 60
+        is_weekly = Q(cadence="Weekly", day_of_week_deadline__isnull=False)
+        is_monthly = Q(cadence="Monthly")
+        days_ahead = (F("day_of_week_deadline") - now_est.weekday() + 7) % 7
+
+        # day of the deadline this month and next month (NULL day_of_month_deadline = last day)
+        last_this = monthrange(now_est.year, now_est.month)[1]
+        last_next = monthrange(*_next_month(now_est.year, now_est.month))[1]
+        day_this = Least(Coalesce("day_of_month_deadline", last_this), last_this, output_field=models.IntegerField())
+        day_next = Least(Coalesce("day_of_month_deadline", last_next), last_next, output_field=models.IntegerField())
+
+        # Custom: days to each rule's next match counting today / after today, per rule in use
+        custom_today, custom_after = [], []
+        from .cache import custom_rules     # core.cache imports the models
+        for rule in custom_rules():
+            recurrence = _recurrence(rule)
+            if recurrence is None:
+                continue
+            is_rule = Q(cadence="Custom", recurrence_rule=rule)
+            for days, whens in zip(recurrence.days_ahead(now_est.date()), (custom_today, custom_after)):
+                if days is not None:
+                    whens.append((is_rule, days * 86400 + deadline_seconds - now_seconds))
+        is_custom = Q(cadence="Custom")
+        no_deadline = Value(None, output_field=models.FloatField())    # invalid rule / no match
+
+        # today's (Daily), this week's (Weekly) or this month's (Monthly) deadline, may be in the past
+        candidate = Case(
+            *(When(is_rule, then=offset) for is_rule, offset in custom_today),
+            When(is_custom, then=no_deadline),
+            When(is_monthly, then=(day_this - now_est.day) * 86400 + deadline_seconds - now_seconds),
+            When(is_weekly, then=days_ahead * 86400 + deadline_seconds - now_seconds),
+            default=deadline_seconds - now_seconds,
+        )
+        # already passed -> roll forward one period
+        return self.alias(_deadline_candidate=candidate).annotate(
+            deadline_offset=Case(
+                *(When(Q(_deadline_candidate__lt=0) & is_rule, then=offset) for is_rule, offset in custom_after),
+                When(Q(_deadline_candidate__lt=0) & is_custom, then=no_deadline),
+                When(
+                    Q(_deadline_candidate__lt=0) & is_monthly,
+                    then=(last_this - now_est.day + day_next) * 86400 + deadline_seconds - now_seconds,
+                ),
+                When(Q(_deadline_candidate__lt=0) & is_weekly, then=F("_deadline_candidate") + 7 * 86400),
+                When(_deadline_candidate__lt=0, then=F("_deadline_candidate") + 86400),
+                default=F("_deadline_candidate"),
+            )
+        )
+
+    def due_within(self, hours, from_dt=None):
+        """reports whose next deadline is within the next `hours` hours (annotates deadline_offset)"""
+        now = from_dt or timezone.now()
+        limit = _wall_clock_offset(now.astimezone(REPORT_TIME_ZONE), now + timedelta(hours=hours))
+        qs = self if "deadline_offset" in self.query.annotations else self.with_deadline_offset(now)
+        return qs.filter(deadline_offset__lte=limit)
+
+
 class TimeSlot(models.Model):
     """Selectable dropdown for time of day."""
 
@@ -52,6 +260,7 @@ class Report(models.Model):
         ("Daily", "Daily"),
         ("Weekly", "Weekly"),
         ("Monthly", "Monthly"),
+        ("Custom", "Custom"),
     ]
 
     DAYS_OF_WEEK_CHOICES = [
@@ -76,6 +285,23 @@ class Report(models.Model):
         choices=DAYS_OF_WEEK_CHOICES, blank=True, null=True
     )
 
+    day_of_month_deadline = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1), MaxValueValidator(31)],
+        help_text="Monthly reports: day of the month (moved to the last day in shorter months), empty = last day.",
+    )
+
+    recurrence_rule = models.CharField(
+        max_length=200,
+        blank=True,
+        validators=[validate_rule],
+        help_text=(
+            "Custom reports: which days the report is due, e.g. FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1 "
+            "(last business day) or FREQ=MONTHLY;BYDAY=2TU (second Tuesday). See core/recurrence.py."
+        ),
+    )
+
     time_deadline = models.ForeignKey(
         TimeSlot,
         on_delete=models.SET_NULL,
@@ -91,9 +317,15 @@ class Report(models.Model):
         blank=True,
     )
 
+    objects = ReportQuerySet.as_manager()
+
     class Meta:
         ordering = ["name"]
 
+    def clean(self):
+        if self.cadence == "Custom" and not self.recurrence_rule:
+            raise ValidationError({"recurrence_rule": "Custom reports need a recurrence rule."})
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -103,28 +335,49 @@ class Report(models.Model):
     def next_deadline_est(self, from_dt=None):
         """
         Next deadline as an aware datetime in America/New_York.
-            Respects time_deadline (TimeSlot) + day_of_week_deadline (0=Mon..6=Sun).
+            Respects time_deadline (TimeSlot) + day_of_week_deadline (0=Mon..6=Sun) + day_of_month_deadline.
             - Daily: today at time, or tomorrow if past.
             - Weekly: next occurrence of configured weekday at time.
+            - Monthly: this month's day at time, or next month's if past.
+            - Custom: the next day matching recurrence_rule at time.
         """
         if not self.time_deadline:
             return None
 
         now_est = (from_dt or timezone.now()).astimezone(REPORT_TIME_ZONE)
-        hour   = self.time_deadline.time.hour
-        minute = self.time_deadline.time.minute
-
-        base_today = now_est.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return _next_deadline(
+            now_est, self.cadence, self.day_of_week_deadline, self.time_deadline.time, self.day_of_month_deadline,
+            self.recurrence_rule,
+        )
 
-        if self.cadence == "Weekly" and self.day_of_week_deadline is not None:
-            delta = (int(self.day_of_week_deadline) - now_est.weekday()) % 7
-            candidate = base_today + timedelta(days=delta)
-            if delta == 0 and now_est > candidate:
-                candidate += timedelta(days=7)
-            return candidate
-
-        # Daily (or fallback)
-        return base_today if now_est <= base_today else base_today + timedelta(days=1)
+    def next_n_occurrences(self, n, from_dt=None):
+        """the next `n` deadlines in REPORT_TIME_ZONE (empty without a time_deadline)"""
+        if not self.time_deadline:
+            return []
+        now_est = (from_dt or timezone.now()).astimezone(REPORT_TIME_ZONE)
+        return _next_deadlines(now_est, self.schedule(), n)
+
+    def schedule(self):
+        """(cadence, weekday, slot time, monthday, rule) tuple the deadline functions take, needs a time_deadline"""
+        return (
+            self.cadence,
+            self.day_of_week_deadline if self.cadence == "Weekly" else None,
+            self.time_deadline.time,
+            self.day_of_month_deadline if self.cadence == "Monthly" else None,
+            self.recurrence_rule if self.cadence == "Custom" else None,
+        )
+
+    def schedule_key(self):
+        """
+        string identifying the schedule deadlines are generated from (None without a time_deadline),
+            stored on DeadlineOccurrence rows to spot reports whose schedule changed since.
+            a rule is stored as its sha1 so the key fits DeadlineOccurrence.schedule_key whatever its length
+        """
+        if not self.time_deadline:
+            return None
+        cadence, weekday, slot_time, monthday, rule = self.schedule()
+        key = f"{cadence}:{weekday}:{monthday}:{slot_time:%H:%M}"
+        return f"{key}:{hashlib.sha1(rule.encode()).hexdigest()}" if rule else key
 
     # ---------- Presentation for a user ----------
     def deadline_for_user(self, user, from_dt=None):
@@ -132,7 +385,7 @@ class Report(models.Model):
         est_dt = self.next_deadline_est(from_dt)
         if not est_dt:
             return None
-        user_tz = ZoneInfo(getattr(getattr(user, "profile", None), "timezone", "UTC"))
+        user_tz = get_zoneinfo(getattr(getattr(user, "profile", None), "timezone", "UTC"))
         return est_dt.astimezone(user_tz)
 
     def remaining_for_user(self, user, from_dt=None):
@@ -174,6 +427,17 @@ class UserProfile(models.Model):
         return f"{self.user.username} @ {self.location}"
 
 
+class UserReportAccessQuerySet(models.QuerySet):
+    def active(self, at=None):
+        """grants that haven't expired at `at` (default now), expires_at=NULL never expires"""
+        now = at or timezone.now()
+        return self.filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+
+    def expired(self, at=None):
+        now = at or timezone.now()
+        return self.filter(expires_at__lte=now)
+
+
 class UserReportAccess(models.Model):
     ROLE_CHOICES = [("view","View"), ("edit","Edit"), ("owner","Owner")]
     user   = models.ForeignKey(User,   on_delete=models.CASCADE, related_name="report_links")       # user -> reports
@@ -183,6 +447,8 @@ class UserReportAccess(models.Model):
     granted_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(null=True, blank=True)
 
+    objects = UserReportAccessQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -193,7 +459,344 @@ class UserReportAccess(models.Model):
         indexes = [
             models.Index(fields=["user", "report"]),
             models.Index(fields=["report", "user"]),
+            models.Index(fields=["user", "expires_at"], name="access_user_expires_idx"),      # per-user active lookup
+            models.Index(                                                                   # sweeper, only grants that can expire
+                fields=["expires_at"],
+                name="access_expiring_idx",
+                condition=Q(expires_at__isnull=False),
+            ),
         ]
      
     def __str__(self):
         return f"{self.user} → {self.report} [{self.role}]"
+
+
+class ArchivedGrant(models.Model):
+    """
+    an expired grant removed by `manage.py sweep_expired_grants`, kept for audits.
+        plain columns instead of foreign keys so the archive outlives the users/reports it mentions;
+        source_id (the UserReportAccess pk) is unique, so a grant two sweeper runs both archive is stored once
+    """
+    source_id = models.BigIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+    report_slug = models.CharField(max_length=200)
+    role = models.CharField(max_length=10, choices=UserReportAccess.ROLE_CHOICES)
+    granted_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["archived_at"]
+
+    def __str__(self):
+        return f"{self.username} → {self.report_slug} [{self.role}, expired {self.expires_at:%Y-%m-%d}]"
+
+
+class UserDeadlineQuerySet(models.QuerySet):
+    def refresh_for_reports(self, reports, from_dt=None):
+        """recompute the stored deadline of every user linked to `reports` (one UPDATE per distinct deadline)"""
+        by_deadline = {}
+        for r in compute_next_deadlines(reports, from_dt=from_dt, tz="UTC"):
+            by_deadline.setdefault(r.next_deadline, []).append(r.pk)
+
+        updated = 0
+        for deadline, report_ids in by_deadline.items():
+            updated += self.filter(report_id__in=report_ids).update(deadline=deadline)
+        return updated
+
+    def sync_access(self, access, from_dt=None):
+        """create/update the row for a single UserReportAccess"""
+        report = compute_next_deadlines([access.report], from_dt=from_dt, tz="UTC")[0]
+        return self.update_or_create(
+            access=access,
+            defaults={"user_id": access.user_id, "report_id": access.report_id, "deadline": report.next_deadline},
+        )[0]
+
+    def sync_accesses(self, accesses, from_dt=None):
+        """bulk version of sync_access() for saved accesses whose `report` is loaded (e.g. after bulk_create)"""
+        compute_next_deadlines({a.report for a in accesses}, from_dt=from_dt, tz="UTC")
+        return self.bulk_create(
+            (
+                UserDeadline(access_id=a.pk, user_id=a.user_id, report_id=a.report_id, deadline=a.report.next_deadline)
+                for a in accesses
+            ),
+            update_conflicts=True,
+            unique_fields=["access"],
+            update_fields=["user", "report", "deadline"],
+        )
+
+    def create_missing(self, from_dt=None):
+        """add rows for accesses that don't have one yet (e.g. rows created before this table existed)"""
+        accesses = list(
+            UserReportAccess.objects
+            .filter(user_deadline__isnull=True)
+            .select_related("report", "report__time_deadline")
+        )
+        compute_next_deadlines([a.report for a in accesses], from_dt=from_dt, tz="UTC")
+        return len(self.bulk_create(
+            UserDeadline(access=a, user_id=a.user_id, report_id=a.report_id, deadline=a.report.next_deadline)
+            for a in accesses
+        ))
+
+    def roll_forward(self, from_dt=None, user=None):
+        """
+        recompute deadlines that have already passed (optionally only the reports linked to `user`).
+            the only writer besides core.signals, run periodically by `manage.py refresh_deadlines`
+        """
+        now = from_dt or timezone.now()
+        stale = self.filter(deadline__lt=now)
+        if user is not None:
+            stale = stale.filter(user=user)
+        report_ids = set(stale.values_list("report_id", flat=True))
+        if not report_ids:
+            return 0
+        return UserDeadline.objects.refresh_for_reports(Report.objects.filter(pk__in=report_ids), from_dt=now)
+
+    def _active_for_user(self, user, now):
+        return self.filter(user=user).filter(Q(access__expires_at__isnull=True) | Q(access__expires_at__gt=now))
+
+    def for_user(self, user, from_dt=None):
+        """
+        a user's rows for active (unexpired) grants whose deadline hasn't passed (or who have none).
+            read only (and lazy, so fine in async views): passed rows are left out until refresh_deadlines
+            rolls them forward, instead of every page view racing to update them, see passed_for_user()
+        """
+        now = from_dt or timezone.now()
+        return self._active_for_user(user, now).filter(Q(deadline__gte=now) | Q(deadline__isnull=True))
+
+    def passed_for_user(self, user, from_dt=None):
+        """
+        the rows for_user() leaves out: active grants whose deadline passed and wasn't rolled forward yet
+            (refresh_deadlines hasn't run since). pages compute their next deadline with with_current_deadlines()
+        """
+        now = from_dt or timezone.now()
+        return self._active_for_user(user, now).filter(deadline__lt=now)
+
+
+class UserDeadline(models.Model):
+    """
+    precomputed next deadline (UTC) for each (user, report) access link.
+        kept in sync from core.signals and rolled forward with `manage.py refresh_deadlines` (every minute,
+        the scheduler service) so the dashboard pages only read rows instead of recomputing every request.
+    """
+    access = models.OneToOneField(UserReportAccess, on_delete=models.CASCADE, related_name="user_deadline")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="report_deadlines")
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name="user_deadlines")
+    deadline = models.DateTimeField(null=True, blank=True)     # null when the report has no deadline
+
+    objects = UserDeadlineQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "deadline"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user} → {self.report} @ {self.deadline}"
+
+
+# ---------- Deadline calendar ----------
+def _next_deadlines(now_est, schedule, n=None, end=None):
+    """
+    successive deadlines of `schedule` (Report.schedule()) from `now_est`, in REPORT_TIME_ZONE:
+        the next `n` of them and/or the ones before `end`
+    """
+    cadence, weekday, slot_time, monthday, rule = schedule
+    if cadence == "Custom":
+        recurrence = _recurrence(rule)
+        if recurrence is None:
+            return []
+        if end is None:
+            return recurrence.next_n_occurrences(now_est, slot_time, n)
+
+    deadlines = []
+    current = now_est
+    while n is None or len(deadlines) < n:
+        deadline = _next_deadline(current, cadence, weekday, slot_time, monthday, rule)
+        if deadline is None or (end is not None and deadline >= end):
+            break
+        deadlines.append(deadline)
+        current = deadline + timedelta(seconds=1)
+    return deadlines
+
+
+def _deadlines_between(schedule, start, end):
+    """every deadline of `schedule` (Report.schedule()) with start <= deadline < end, in UTC"""
+    return [d.astimezone(dt_timezone.utc) for d in _next_deadlines(start.astimezone(REPORT_TIME_ZONE), schedule, end=end)]
+
+
+class DeadlineOccurrenceQuerySet(models.QuerySet):
+    def between(self, start, end):
+        """occurrences due in [start, end), a range scan on the due_at index"""
+        return self.filter(due_at__gte=start, due_at__lt=end)
+
+    def due_within(self, hours, from_dt=None):
+        now = from_dt or timezone.now()
+        return self.between(now, now + timedelta(hours=hours))
+
+    def overdue(self, since, from_dt=None):
+        """occurrences that passed between `since` and now"""
+        return self.between(since, from_dt or timezone.now())
+
+    def for_location(self, location):
+        """occurrences of reports that at least one user at `location` (UserProfile.location) has access to"""
+        return self.filter(Exists(
+            UserReportAccess.objects.active().filter(report=OuterRef("report"), user__profile__location=location)
+        ))
+
+    def extend(self, horizon_days=90, from_dt=None, reports=None, batch_size=5000):
+        """
+        make sure every report has its occurrences generated up to `horizon_days` from now.
+            reports that already have upcoming rows are only extended past their last one; if a report's
+            schedule_key changed its upcoming rows are deleted and generated again. Past rows are kept.
+            Deadlines are computed once per distinct schedule and shared by the reports using it.
+            returns {"created": rows inserted, "regenerated": reports whose schedule changed}
+        """
+        now = from_dt or timezone.now()
+        horizon = now + timedelta(days=horizon_days)
+        existing = self.filter(due_at__gte=now)
+        if reports is None:
+            reports = Report.objects.select_related("time_deadline").iterator(chunk_size=2000)
+        else:
+            reports = list(reports)
+            existing = existing.filter(report_id__in=[r.pk for r in reports])
+
+        upcoming = {}       # report id -> (schedule keys, last due_at)
+        rows = (
+            existing
+            .values("report_id", "schedule_key")
+            .annotate(until=Max("due_at"))
+            .values_list("report_id", "schedule_key", "until")
+        )
+        for report_id, key, until in rows:
+            keys, last = upcoming.get(report_id, (set(), until))
+            upcoming[report_id] = (keys | {key}, max(last, until))
+
+        stale, pending, computed = [], [], {}
+        created = regenerated = 0
+        for report in reports:
+            key = report.schedule_key()
+            keys, until = upcoming.get(report.pk, (set(), None))
+            if keys and keys != {key}:
+                stale.append(report.pk)
+                regenerated += 1
+                until = None
+            if key is None:
+                continue
+
+            start = until + timedelta(seconds=1) if until else now
+            schedule = report.schedule()
+            if (schedule, start) not in computed:
+                computed[(schedule, start)] = _deadlines_between(schedule, start, horizon)
+            pending += (
+                DeadlineOccurrence(report_id=report.pk, due_at=due_at, schedule_key=key)
+                for due_at in computed[(schedule, start)]
+            )
+            if len(pending) >= batch_size:
+                self._delete_upcoming(stale, now)
+                stale = []
+                created += len(self.bulk_create(pending, batch_size=batch_size, ignore_conflicts=True))
+                pending = []
+
+        self._delete_upcoming(stale, now)
+        created += len(self.bulk_create(pending, batch_size=batch_size, ignore_conflicts=True))
+        return {"created": created, "regenerated": regenerated}
+
+    def _delete_upcoming(self, report_ids, now):
+        if report_ids:
+            self.filter(report_id__in=report_ids, due_at__gte=now).delete()
+
+    def prune(self, before):
+        """drop occurrences due before `before`"""
+        return self.filter(due_at__lt=before).delete()[0]
+
+
+class DeadlineOccurrence(models.Model):
+    """
+    one scheduled deadline of a report (calendar index).
+        generated for a rolling horizon by `manage.py extend_deadline_calendar` and regenerated from
+        core.signals when a schedule changes, so "what is due when" is a range scan on due_at
+        instead of evaluating every report in python.
+    """
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name="occurrences")
+    due_at = models.DateTimeField()
+    schedule_key = models.CharField(max_length=64)      # Report.schedule_key() the row was generated from
+
+    objects = DeadlineOccurrenceQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["due_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["report", "due_at"], name="unique_report_occurrence"),
+        ]
+        indexes = [
+            models.Index(fields=["due_at", "report"], name="occurrence_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.report} @ {self.due_at}"
+
+
+# ---------- Reminders ----------
+class ReminderOutbox(models.Model):
+    """
+    one reminder email for one (user, report, deadline), queued by core.reminders.enqueue_reminders()
+        and sent by drain_outbox(). The unique constraint makes enqueueing idempotent, so the scheduler
+        can run as often as it likes without sending a deadline's reminder twice. `leased_until` is set
+        while a drainer is sending the row, other drainers skip it until then.
+    """
+    PENDING, SENT, FAILED = "pending", "sent", "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reminders")
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name="reminders")
+    deadline = models.DateTimeField()
+    email = models.EmailField()         # address at enqueue time
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    leased_until = models.DateTimeField(null=True, blank=True)     # claimed by a drainer until then
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "report", "deadline"], name="unique_reminder"),
+        ]
+        indexes = [
+            models.Index(fields=["id"], name="reminder_pending_idx", condition=Q(status="pending")),
+        ]
+
+    def __str__(self):
+        return f"{self.email} → {self.report} @ {self.deadline} [{self.status}]"
+
+
+# ---------- Data entry ----------
+class ReportEntry(models.Model):
+    """
+    one manually entered row of a report (what the streamlit data entry table edits).
+        rows are addressed by `row_key`, unique per report, so a submitted table can be upserted;
+        `user` is who the row ties to (matched by email in submitted tables)
+    """
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name="entries")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="report_entries")
+    row_key = models.CharField(max_length=64)
+    entry_date = models.DateField()
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    notes = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=1)        # bumped on every write, see core.entries
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["report", "row_key"]
+        constraints = [
+            models.UniqueConstraint(fields=["report", "row_key"], name="unique_report_entry_key"),
+        ]
+        indexes = [
+            models.Index(fields=["report", "user"], name="entry_report_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.report} / {self.row_key}"
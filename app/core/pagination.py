@@ -0,0 +1,212 @@
+# core/pagination.py
+"""
+Keyset (cursor) pagination.
+
+Instead of COUNT(*) + OFFSET, each page is fetched with `WHERE (ordering columns) > (last row seen)`
+and LIMIT, so with an index on the ordering columns the 1000th page costs the same as the first.
+Pages are addressed by opaque cursor tokens instead of page numbers.
+
+EstimatedCountPaginator is the page number counterpart for the admin: unfiltered lists of big
+tables take their count from the planner's estimate instead of COUNT(*).
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT, PREVIOUS = "n", "p"
+
+
+def _encode_value(value):
+    # full precision isoformat (DjangoJSONEncoder drops microseconds, which would break datetime keys)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({"k": values, "d": direction}, default=_encode_value, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """(values, direction) or None for a missing/invalid token"""
+    if not token:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        values, direction = payload["k"], payload["d"]
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        return None
+    return values, direction
+
+
+class KeysetPage:
+    """one page of rows + the cursors of its neighbours (same role as django's Page in templates)"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    paginates `queryset` by `ordering`, a list of field names sorted ascending.
+        the fields together must be unique (end with the pk or a unique field) so every row has
+        exactly one position; index them in that order for the speed-up.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+
+    def _after(self, values, reverse=False):
+        """Q for rows strictly after (or before when reverse) `values` in ordering order"""
+        lookup = "lt" if reverse else "gt"
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            equal_prefix = {f: v for f, v in zip(self.ordering[:i], values[:i])}
+            condition |= Q(**equal_prefix, **{f"{field}__{lookup}": values[i]})
+        return condition
+
+    def _key(self, obj):
+        values = []
+        for field in self.ordering:
+            value = obj
+            for part in field.split("__"):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def _field(self, path):
+        model = self.queryset.model
+        *relations, name = path.split("__")
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.pk if name == "pk" else model._meta.get_field(name)
+
+    def _query(self, cursor):
+        """
+        (sliced queryset of up to per_page + 1 rows, direction, cursor values),
+            direction and values are None for the first page
+        """
+        decoded = decode_cursor(cursor)
+        if decoded is not None and len(decoded[0]) != len(self.ordering):
+            decoded = None      # cursor from a different ordering
+
+        if decoded is None:
+            return self.queryset.order_by(*self.ordering)[: self.per_page + 1], None, None
+        values, direction = decoded
+        ordering = self.ordering if direction == NEXT else [f"-{f}" for f in self.ordering]
+        after = self.queryset.filter(self._after(values, reverse=direction == PREVIOUS))
+        return after.order_by(*ordering)[: self.per_page + 1], direction, values
+
+    def _with_extra(self, rows, extra, direction, values):
+        """
+        the db rows plus in-memory `extra` objects (rows whose key the db doesn't have yet, e.g. deadlines
+            computed on the fly), cut the same way: after the cursor, in page order, up to per_page + 1
+        """
+        if not extra:
+            return rows
+        reverse = direction == PREVIOUS
+        if values is not None:
+            bound = [self._field(f).to_python(v) for f, v in zip(self.ordering, values)]
+            extra = [obj for obj in extra if (self._key(obj) < bound if reverse else self._key(obj) > bound)]
+        return sorted([*rows, *extra], key=self._key, reverse=reverse)[: self.per_page + 1]
+
+    def _page(self, rows, direction):
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if direction is None:
+            has_next, has_previous = more, False
+        elif direction == NEXT:
+            has_next, has_previous = more, True
+        else:
+            has_next, has_previous = True, more
+            rows.reverse()
+
+        next_cursor = encode_cursor(self._key(rows[-1]), NEXT) if rows and has_next else None
+        previous_cursor = encode_cursor(self._key(rows[0]), PREVIOUS) if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None, extra=()):
+        """the page after/before `cursor`, `extra` objects are paginated along with the queryset's rows"""
+        try:
+            queryset, direction, values = self._query(cursor)
+            rows = self._with_extra(list(queryset), extra, direction, values)
+        except (ValueError, TypeError, ValidationError):
+            if cursor is None:
+                raise
+            return self.get_page(None, extra)      # tampered cursor -> first page, like Paginator.get_page()
+        return self._page(rows, direction)
+
+    async def aget_page(self, cursor=None, extra=()):
+        """get_page() for async views, rows are fetched with the async ORM"""
+        try:
+            queryset, direction, values = self._query(cursor)
+            rows = self._with_extra([row async for row in queryset], extra, direction, values)
+        except (ValueError, TypeError, ValidationError):
+            if cursor is None:
+                raise
+            return await self.aget_page(None, extra)
+        return self._page(rows, direction)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count comes from pg_class.reltuples (kept by ANALYZE/autovacuum) on postgres when
+        the queryset isn't filtered and the estimate is at least `estimate_above` rows. Smaller tables,
+        filtered/searched lists and other databases get the exact COUNT(*).
+    """
+
+    estimate_above = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = self._estimate(self.object_list)
+            if estimate is not None and estimate >= self.estimate_above:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def _estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # -1 = never analyzed
+        return row[0] if row and row[0] is not None and row[0] >= 0 else None
@@ -0,0 +1,100 @@
+# core/permissions.py
+"""
+Report level permissions from UserReportAccess roles.
+
+A user's whole {report_id: role} map is loaded with one query and then cached on the user object
+(one request) and in the shared cache. The shared entry is keyed by the user's ("access", id) version
+which core.signals bumps when a grant is saved/deleted, and it's only used until the user's next grant
+expires. After that every check is a dict lookup.
+
+There is deliberately no per-process layer: this is an authorization check, so a revoked role has to
+stop working in every worker as soon as the version is bumped. That needs CACHE_URL pointing at a
+shared cache (redis) when there is more than one worker process, see core.checks.
+"""
+from django.contrib.auth.backends import BaseBackend
+from django.core.cache import cache
+from django.utils import timezone
+
+from .cache import get_versions, version_key
+from .models import Report, UserReportAccess
+
+# role -> rank, a role includes everything below it
+ROLE_RANK = {"view": 1, "edit": 2, "owner": 3}
+
+# django permission codename -> minimum role on the report
+PERM_ROLES = {
+    "view_report": "view",
+    "change_report": "edit",
+    "delete_report": "owner",
+}
+
+ROLES_TIMEOUT = 60 * 60         # shared cache timeout when none of the user's grants expire
+
+
+def roles_key(user_id, version):
+    return f"core:roles:{user_id}:{version}"
+
+
+def _load_roles(user_id, now):
+    """(valid_until, roles) from the db, valid_until = when the first of the active grants expires"""
+    roles, valid_until = {}, None
+    for report_id, role, expires_at in (
+        UserReportAccess.objects.active(now).filter(user_id=user_id).values_list("report_id", "role", "expires_at")
+    ):
+        roles[report_id] = role
+        if expires_at is not None and (valid_until is None or expires_at < valid_until):
+            valid_until = expires_at
+    return valid_until, roles
+
+
+def get_report_roles(user):
+    """{report_id: role} of the user's active grants, empty for anonymous/inactive users"""
+    if not user.is_authenticated or not user.is_active:
+        return {}
+
+    now = timezone.now()
+    cached = getattr(user, "_report_roles", None)       # same request
+    if cached is not None and (cached[0] is None or cached[0] > now):
+        return cached[1]
+
+    (version,) = get_versions(version_key("access", user.pk))
+    key = roles_key(user.pk, version)
+    entry = cache.get(key)
+    if entry is None or (entry[0] is not None and entry[0] <= now):
+        entry = _load_roles(user.pk, now)
+        timeout = ROLES_TIMEOUT
+        if entry[0] is not None:
+            timeout = max(1, min(timeout, int((entry[0] - now).total_seconds()) + 1))
+        cache.set(key, entry, timeout)
+
+    user._report_roles = entry
+    return entry[1]
+
+
+def get_report_role(user, report):
+    """the user's role on `report` (a Report or its pk), or None"""
+    report_id = report.pk if isinstance(report, Report) else report
+    return get_report_roles(user).get(report_id)
+
+
+def has_report_role(user, report, role):
+    """True if the user has at least `role` on `report` (superusers always do)"""
+    if user.is_active and user.is_superuser:
+        return True
+    current = get_report_role(user, report)
+    return current is not None and ROLE_RANK[current] >= ROLE_RANK[role]
+
+
+class ReportRoleBackend(BaseBackend):
+    """
+    object permissions for reports: user.has_perm("core.change_report", report) checks the user's role.
+        doesn't authenticate anyone and has no opinion on model level perms (obj=None), ModelBackend handles those
+    """
+
+    def has_perm(self, user_obj, perm, obj=None):
+        if not isinstance(obj, Report):
+            return False
+        app_label, _, codename = perm.partition(".")
+        if app_label != Report._meta.app_label or codename not in PERM_ROLES:
+            return False
+        return has_report_role(user_obj, obj, PERM_ROLES[codename])
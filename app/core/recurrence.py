@@ -0,0 +1,190 @@
+# core/recurrence.py
+"""
+Recurrence rules for reports with a "Custom" cadence (Report.recurrence_rule).
+
+Rules are a small subset of RFC 5545 RRULE, e.g.
+    FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1   last business day of the month
+    FREQ=MONTHLY;BYDAY=2TU                          second Tuesday of the month
+    FREQ=MONTHLY;BYMONTHDAY=1,15                    the 1st and the 15th
+    FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR                 every business day
+    FREQ=WEEKLY;BYDAY=MO,TH                         Mondays and Thursdays
+
+A rule is parsed once into a Recurrence (compile_rule() is cached on the rule text, so editing a
+report's rule simply compiles the new text). Lookups only work on dates: weekday rules use a 7 entry
+table, monthly rules a sorted tuple of matching days per month that is built the first time a month
+is asked for, so finding the next date is a table lookup or a bisect. The time of day comes from the
+report's TimeSlot and is attached in the caller's time zone, see next_after().
+"""
+from bisect import bisect_left, bisect_right
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+SEARCH_MONTHS = 48          # a monthly rule that matches nothing for this long never matches
+
+
+def _int_list(value, name, low, high):
+    try:
+        numbers = [int(v) for v in value.split(",")]
+    except ValueError:
+        raise ValueError(f"{name} must be a list of numbers") from None
+    if any(n == 0 or not low <= n <= high for n in numbers):
+        raise ValueError(f"{name} values must be between {low} and {high}, not 0")
+    return numbers
+
+
+def _by_day(value):
+    """[(ordinal or None, weekday)] from e.g. "MO,2TU,-1FR" """
+    days = []
+    for item in value.split(","):
+        item = item.strip()
+        code, ordinal = item[-2:], item[:-2]
+        if code not in WEEKDAYS:
+            raise ValueError(f"unknown weekday {item!r} in BYDAY")
+        if ordinal:
+            ordinal = _int_list(ordinal, "BYDAY ordinal", -5, 5)[0]
+        days.append((ordinal or None, WEEKDAYS[code]))
+    return days
+
+
+def parse_rule(text):
+    """{part: value} from the rule text, raises ValueError with a readable message"""
+    parts = {}
+    for item in text.upper().replace(" ", "").strip(";").split(";"):
+        key, sep, value = item.partition("=")
+        if not sep or not value:
+            raise ValueError(f"expected KEY=VALUE, got {item!r}")
+        if key in parts:
+            raise ValueError(f"{key} given twice")
+        parts[key] = value
+
+    unknown = parts.keys() - {"FREQ", "BYDAY", "BYMONTHDAY", "BYSETPOS"}
+    if unknown:
+        raise ValueError(f"unsupported rule part(s): {', '.join(sorted(unknown))}")
+    if parts.get("FREQ") not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    return parts
+
+
+class Recurrence:
+    """compiled rule: finds matching dates, see the module docstring"""
+
+    def __init__(self, text):
+        parts = parse_rule(text)
+        self.text = text
+        self.freq = parts["FREQ"]
+        by_day = _by_day(parts["BYDAY"]) if "BYDAY" in parts else []
+        self.month_days = _int_list(parts["BYMONTHDAY"], "BYMONTHDAY", -31, 31) if "BYMONTHDAY" in parts else []
+        self.set_positions = _int_list(parts["BYSETPOS"], "BYSETPOS", -31, 31) if "BYSETPOS" in parts else []
+        self.months = {}        # (year, month) -> sorted matching days
+
+        if self.freq != "MONTHLY":
+            if self.month_days or self.set_positions or any(ordinal for ordinal, _ in by_day):
+                raise ValueError("BYMONTHDAY, BYSETPOS and numbered BYDAY only work with FREQ=MONTHLY")
+            if self.freq == "WEEKLY" and not by_day:
+                raise ValueError("FREQ=WEEKLY needs BYDAY")
+            weekdays = {weekday for _, weekday in by_day} or set(range(7))
+            # days from each weekday to the next matching one, counting the day itself / not counting it
+            self.ahead = tuple(min((w - d) % 7 for w in weekdays) for d in range(7))
+            self.after = tuple(min((w - d - 1) % 7 + 1 for w in weekdays) for d in range(7))
+            return
+
+        if not by_day and not self.month_days:
+            raise ValueError("FREQ=MONTHLY needs BYDAY or BYMONTHDAY")
+        self.by_day = by_day
+        if not any(self._days(2000 + m // 12, m % 12 + 1) for m in range(SEARCH_MONTHS)):
+            raise ValueError("rule never matches")
+
+    def _days(self, year, month):
+        days = self.months.get((year, month))
+        if days is None:
+            days = self._build_month(year, month)
+            if len(self.months) > 1200:         # a century of months, only reached by far off lookups
+                self.months.clear()
+            self.months[(year, month)] = days
+        return days
+
+    def _build_month(self, year, month):
+        first_weekday, last = monthrange(year, month)
+        candidates = set(range(1, last + 1))
+        if self.month_days:
+            candidates &= {d if d > 0 else last + d + 1 for d in self.month_days}
+        if self.by_day:
+            matching = set()
+            for ordinal, weekday in self.by_day:
+                days = list(range((weekday - first_weekday) % 7 + 1, last + 1, 7))
+                if ordinal is None:
+                    matching.update(days)
+                elif -len(days) <= ordinal <= len(days):
+                    matching.add(days[ordinal - 1 if ordinal > 0 else ordinal])
+            candidates &= matching
+
+        days = sorted(candidates)
+        if self.set_positions:
+            days = sorted({days[p - 1 if p > 0 else p] for p in self.set_positions if -len(days) <= p <= len(days)})
+        return tuple(days)
+
+    def next_date(self, day, inclusive=True):
+        """first matching date on/after `day` (strictly after with inclusive=False), None if there's none"""
+        if self.freq != "MONTHLY":
+            return day + timedelta(days=(self.ahead if inclusive else self.after)[day.weekday()])
+
+        year, month = day.year, day.month
+        days = self._days(year, month)
+        i = (bisect_left if inclusive else bisect_right)(days, day.day)
+        if i < len(days):
+            return date(year, month, days[i])
+        for _ in range(SEARCH_MONTHS):
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            days = self._days(year, month)
+            if days:
+                return date(year, month, days[0])
+        return None
+
+    def next_after(self, now, deadline_time):
+        """
+        next deadline at `deadline_time` on a matching date, in now's time zone (today counts until the time passes).
+            the wall clock time is attached with the zone's rules for that date, so deadlines keep
+            their local time across DST changes (a time skipped by the spring change lands an hour later)
+        """
+        today = now.date()
+        day = self.next_date(today)
+        deadline_today = now.replace(hour=deadline_time.hour, minute=deadline_time.minute, second=0, microsecond=0)
+        if day == today and now > deadline_today:
+            day = self.next_date(today, inclusive=False)
+        if day is None:
+            return None
+        return datetime.combine(day, deadline_time.replace(second=0, microsecond=0), tzinfo=now.tzinfo)
+
+    def next_n_occurrences(self, now, deadline_time, n):
+        """the next `n` deadlines from `now` (fewer if the rule runs out)"""
+        occurrences = []
+        deadline = self.next_after(now, deadline_time)
+        while deadline is not None and len(occurrences) < n:
+            occurrences.append(deadline)
+            day = self.next_date(deadline.date(), inclusive=False)
+            deadline = day and datetime.combine(day, deadline.timetz())
+        return occurrences
+
+    def days_ahead(self, today):
+        """(days to the next match counting today, days to the next match after today), None if none (for SQL)"""
+        first, second = self.next_date(today), self.next_date(today, inclusive=False)
+        return (first - today).days if first else None, (second - today).days if second else None
+
+
+@lru_cache(maxsize=256)
+def compile_rule(text):
+    """cached Recurrence for a rule text, raises ValueError for invalid rules"""
+    return Recurrence(text)
+
+
+def validate_rule(text):
+    """model field validator"""
+    try:
+        compile_rule(text)
+    except ValueError as exc:
+        raise ValidationError(f"invalid recurrence rule: {exc}") from None
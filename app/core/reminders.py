@@ -0,0 +1,188 @@
+# core/reminders.py
+"""
+Deadline reminder emails through a database outbox (ReminderOutbox).
+
+enqueue_reminders() finds the reports due within the lead time, computes each report's deadline once
+and inserts one outbox row per (user with access, report, deadline) in bulk; rows that already exist
+are skipped by the unique constraint. drain_outbox() then sends pending rows in batches: a batch is
+claimed by setting a lease on it in a short transaction, sent outside of any transaction over a thread
+pool (one email backend connection per thread), and the results are written back with a single
+bulk_update. No transaction or row lock is held while talking to the mail server, so a slow server
+doesn't block other writers (with SQLITE_TUNED's BEGIN IMMEDIATE a transaction holds the database's
+write lock). A drainer that dies mid batch leaves its rows pending, they're picked up again once the
+lease runs out (so those can be sent twice).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .grants import chunked
+from .models import REPORT_TIME_ZONE, Report, ReminderOutbox, UserReportAccess, compute_next_deadlines, get_zoneinfo
+
+logger = logging.getLogger(__name__)  # use module name for clarity
+
+
+# ---------- enqueue ----------
+def upcoming_deadlines(within_hours, from_dt=None):
+    """{report_id: deadline (UTC)} for reports whose next deadline is within `within_hours`"""
+    now = from_dt or timezone.now()
+    end = now + timedelta(hours=within_hours)
+    reports = compute_next_deadlines(
+        Report.objects.due_within(within_hours, now).select_related("time_deadline"), from_dt=now, tz="UTC"
+    )
+    # due_within() works on the wall clock, the exact check drops anything a DST shift pushed past the window
+    return {r.pk: r.next_deadline for r in reports if r.next_deadline is not None and r.next_deadline <= end}
+
+
+def _insert_new(reminders):
+    """
+    insert outbox rows, skipping the ones that already exist, returns how many this call inserted.
+        INSERT ... ON CONFLICT DO NOTHING RETURNING id (sqlite and postgres): bulk_create(ignore_conflicts=True)
+        can't tell inserted rows from skipped ones, and counting rows afterwards would include whatever a
+        concurrent run inserted meanwhile
+    """
+    connection = connections[router.db_for_write(ReminderOutbox)]
+    opts = ReminderOutbox._meta
+    fields = [f for f in opts.concrete_fields if not f.primary_key]
+    quote = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(opts.db_table)} ({', '.join(quote(f.column) for f in fields)}) VALUES {{}} "
+        f"ON CONFLICT DO NOTHING RETURNING {quote(opts.pk.column)}"
+    )
+    row = f"({', '.join(['%s'] * len(fields))})"
+
+    inserted = 0
+    with connection.cursor() as cursor:
+        for chunk in chunked(reminders, connection.ops.bulk_batch_size(fields, reminders)):
+            params = [f.get_db_prep_save(f.pre_save(r, True), connection) for r in chunk for f in fields]
+            cursor.execute(sql.format(", ".join([row] * len(chunk))), params)
+            inserted += len(cursor.fetchall())
+    return inserted
+
+
+def enqueue_reminders(within_hours, from_dt=None, batch_size=5000):
+    """queue a reminder for every active grant on a report due within `within_hours`, returns rows added"""
+    now = from_dt or timezone.now()
+    deadlines = upcoming_deadlines(within_hours, now)
+    if not deadlines:
+        return 0
+
+    grants = (
+        UserReportAccess.objects
+        .active(now)
+        .filter(report_id__in=deadlines, user__is_active=True)
+        .exclude(user__email="")
+        .values_list("user_id", "report_id", "user__email")
+        .iterator(chunk_size=batch_size)
+    )
+    added = 0
+    for chunk in chunked(grants, batch_size):
+        added += _insert_new([
+            ReminderOutbox(user_id=user_id, report_id=report_id, deadline=deadlines[report_id], email=email)
+            for user_id, report_id, email in chunk
+        ])
+    return added
+
+
+# ---------- send ----------
+def build_message(reminder):
+    profile = getattr(reminder.user, "profile", None)
+    tz = get_zoneinfo(profile.timezone) if profile and profile.timezone else REPORT_TIME_ZONE
+    due = timezone.localtime(reminder.deadline, tz)
+    return EmailMessage(
+        subject=f"Reminder: {reminder.report.name} is due {due:%a %b %d, %I:%M %p %Z}",
+        body=(
+            f"Hi {reminder.user.first_name or reminder.user.username},\n\n"
+            f"the report \"{reminder.report.name}\" is due on {due:%A, %B %d at %I:%M %p %Z}.\n"
+        ),
+        to=[reminder.email],
+    )
+
+
+def _send_slice(reminders):
+    """send on one backend connection, returns [(reminder, error or None)]"""
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:        # smtp/network errors differ per backend, record whatever it was
+        return [(reminder, repr(exc)) for reminder in reminders]
+
+    results = []
+    try:
+        for reminder in reminders:
+            try:
+                connection.send_messages([build_message(reminder)])
+            except Exception as exc:
+                results.append((reminder, repr(exc)))
+            else:
+                results.append((reminder, None))
+    finally:
+        connection.close()
+    return results
+
+
+def claim_batch(after_id, batch_size, lease_seconds):
+    """
+    lease the next pending rows after `after_id` (id order) and return them, the lease is committed
+        before anything is sent. skip_locked lets several drainers claim side by side on postgres
+        (sqlite serializes the transactions instead)
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            ReminderOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=ReminderOutbox.PENDING, id__gt=after_id)
+            .filter(Q(leased_until__isnull=True) | Q(leased_until__lte=now))
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        ReminderOutbox.objects.filter(id__in=ids).update(leased_until=now + timedelta(seconds=lease_seconds))
+    return list(ReminderOutbox.objects.filter(id__in=ids).select_related("user", "user__profile", "report").order_by("id"))
+
+
+def drain_outbox(batch_size=500, workers=8, max_attempts=3, lease_seconds=600):
+    """
+    send the pending reminders once each, returns (sent, failed).
+        rows are walked in id order, so a row that fails stays pending for the next run instead of
+        being retried straight away; after `max_attempts` failures it's marked failed.
+        `lease_seconds` has to cover sending a whole batch, after that other drainers may take the rows
+    """
+    sent = failed = 0
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = claim_batch(last_id, batch_size, lease_seconds)
+            if not batch:
+                return sent, failed
+            last_id = batch[-1].pk
+
+            # no transaction open while sending
+            slices = [batch[i::workers] for i in range(min(workers, len(batch)))]
+            results = [result for results in pool.map(_send_slice, slices) for result in results]
+
+            now = timezone.now()
+            errors = []
+            for reminder, error in results:
+                reminder.attempts += 1
+                reminder.leased_until = None
+                if error is None:
+                    reminder.status, reminder.sent_at, reminder.last_error = ReminderOutbox.SENT, now, ""
+                    sent += 1
+                else:
+                    reminder.last_error = error
+                    errors.append(error)
+                    if reminder.attempts >= max_attempts:
+                        reminder.status = ReminderOutbox.FAILED
+                        failed += 1
+            ReminderOutbox.objects.bulk_update(batch, ["status", "attempts", "sent_at", "last_error", "leased_until"])
+
+            if errors:
+                logger.warning("%s of %s reminders in batch failed, last error: %s", len(errors), len(batch), errors[-1])
@@ -1,11 +1,108 @@
 # core/signals.py
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import UserProfile
+from django.utils import timezone
+from .cache import access_changed, bump_version, forget_profile
+from .models import UserProfile, Report, TimeSlot, UserReportAccess, UserDeadline, DeadlineOccurrence
+
+# report fields the next deadline depends on
+DEADLINE_FIELDS = {"cadence", "day_of_week_deadline", "day_of_month_deadline", "recurrence_rule", "time_deadline"}
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def ensure_profile(sender, instance, created, **kwargs):
     """autocreate a profile for new users"""
     if created:
         UserProfile.objects.create(user=instance)
+
+
+# ---------- keep UserDeadline rows in sync ----------
+@receiver(post_save, sender=UserReportAccess)
+def sync_user_deadline(sender, instance, raw=False, **kwargs):
+    """new/changed access link -> (re)compute its precomputed deadline row"""
+    if raw:
+        return
+    UserDeadline.objects.sync_access(instance)
+
+@receiver(post_save, sender=Report)
+def refresh_report_deadlines(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """schedule changed -> recompute the deadline for every user linked to the report"""
+    if raw or created:
+        return      # a brand new report has no access links yet
+    if update_fields is not None and not DEADLINE_FIELDS.intersection(update_fields):
+        return
+    UserDeadline.objects.refresh_for_reports([instance])
+
+@receiver(post_save, sender=TimeSlot)
+def refresh_timeslot_deadlines(sender, instance, created, raw=False, **kwargs):
+    """a time slot was edited -> recompute every report using it"""
+    if raw or created:
+        return
+    UserDeadline.objects.refresh_for_reports(Report.objects.filter(time_deadline=instance))
+
+@receiver(post_delete, sender=TimeSlot)
+def clear_timeslot_deadlines(sender, instance, **kwargs):
+    """
+    a time slot was deleted -> its reports were set to no time_deadline with a bulk update (no signals),
+        so clear the deadlines still stored for them
+    """
+    UserDeadline.objects.refresh_for_reports(
+        Report.objects.filter(time_deadline__isnull=True, user_deadlines__deadline__isnull=False).distinct()
+    )
+
+
+# ---------- keep the DeadlineOccurrence calendar in sync ----------
+@receiver(post_save, sender=Report)
+def refresh_report_calendar(sender, instance, raw=False, update_fields=None, **kwargs):
+    """new report or schedule changed -> generate its upcoming occurrences (only the changed ones are replaced)"""
+    if raw:
+        return
+    if update_fields is not None and not DEADLINE_FIELDS.intersection(update_fields):
+        return
+    DeadlineOccurrence.objects.extend(settings.CORE_DEADLINE_HORIZON_DAYS, reports=[instance])
+
+@receiver(post_save, sender=TimeSlot)
+def refresh_timeslot_calendar(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    DeadlineOccurrence.objects.extend(
+        settings.CORE_DEADLINE_HORIZON_DAYS,
+        reports=Report.objects.filter(time_deadline=instance).select_related("time_deadline"),
+    )
+
+@receiver(post_delete, sender=TimeSlot)
+def clear_timeslot_calendar(sender, instance, **kwargs):
+    """deleted time slot -> drop the upcoming occurrences of the reports that were using it"""
+    DeadlineOccurrence.objects.extend(
+        settings.CORE_DEADLINE_HORIZON_DAYS,
+        reports=Report.objects.filter(time_deadline__isnull=True, occurrences__due_at__gte=timezone.now()).distinct(),
+    )
+
+
+# ---------- cache invalidation (see core.cache) ----------
+@receiver([post_save, post_delete], sender=UserReportAccess)
+def invalidate_access_cache(sender, instance, **kwargs):
+    """a user's links changed -> drop that user's cached pages and report roles"""
+    access_changed(instance.user_id)
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """a user's profile changed -> drop that user's cached pages"""
+    bump_version("user", instance.user_id)
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    """profile edited -> UserTimezoneMiddleware reloads it on the next request"""
+    forget_profile(instance.user_id)
+
+@receiver([post_save, post_delete], sender=Report)
+@receiver([post_save, post_delete], sender=TimeSlot)
+def invalidate_reports_cache(sender, instance, **kwargs):
+    """report names/schedules are shown to every linked user -> drop all cached pages"""
+    bump_version("reports")
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_emails(sender, instance, update_fields=None, **kwargs):
+    """user emails are part of the entry exports (core.entries.entries_etag), logins only touch last_login"""
+    if update_fields is None or "email" in update_fields:
+        bump_version("emails")
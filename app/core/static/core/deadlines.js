@@ -0,0 +1,45 @@
+// core/static/core/deadlines.js
+// live countdowns: every element with data-deadline counts down locally, the server pushes
+// new deadlines over SSE (core.views.deadline_events) when they roll forward or change.
+// loaded from base.html, which passes the stream url as data-events-url
+(function () {
+  const script = document.currentScript;
+  const countdowns = () => document.querySelectorAll("[data-deadline]");
+  if (!countdowns().length || !window.EventSource) return;
+
+  const OVERDUE = "text-red-600 font-semibold", PENDING = "text-green-700";
+  let clockOffset = 0;    // server time - browser time
+
+  function render(el, overdue) {
+    const seconds = Math.floor((Date.parse(el.dataset.deadline) - Date.now() - clockOffset) / 1000);
+    if (overdue || seconds <= 0) {
+      el.textContent = "Overdue!";
+      el.className = OVERDUE;
+      return;
+    }
+    const days = Math.floor(seconds / 86400);
+    const hours = Math.floor((seconds % 86400) / 3600);
+    const minutes = Math.floor((seconds % 3600) / 60);
+    el.textContent = `${days}d, ${hours}h, ${minutes}m`;
+    el.className = PENDING;
+  }
+  const tick = () => countdowns().forEach((el) => render(el));
+
+  const source = new EventSource(script.dataset.eventsUrl);
+  source.addEventListener("deadlines", (event) => {
+    const data = JSON.parse(event.data);
+    clockOffset = Date.parse(data.now) - Date.now();
+    const deadlines = new Map(data.deadlines.map((d) => [d.report, d.deadline]));
+    countdowns().forEach((el) => {
+      if (deadlines.has(el.dataset.report)) el.dataset.deadline = deadlines.get(el.dataset.report);
+    });
+    tick();
+  });
+  source.addEventListener("overdue", (event) => {
+    const reports = new Set(JSON.parse(event.data).map((d) => d.report));
+    countdowns().forEach((el) => { if (reports.has(el.dataset.report)) render(el, true); });
+  });
+
+  tick();
+  setInterval(tick, 30000);
+})();
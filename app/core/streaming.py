@@ -0,0 +1,33 @@
+# core/streaming.py
+"""
+Streaming responses that stay streamed under ASGI.
+
+Django serves a StreamingHttpResponse built on a plain (sync) iterator under ASGI by reading the
+whole iterator into a list first, which throws away the chunked reads (iterator() with a server side
+cursor on postgres) the exports rely on. streaming_response() hands ASGI an async iterator instead,
+pulling one chunk at a time from the sync one on the request's sync thread, the thread its db
+connection lives on.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_DONE = object()
+
+
+async def _achunks(iterator):
+    iterator = iter(iterator)
+    try:
+        while (chunk := await sync_to_async(next)(iterator, _DONE)) is not _DONE:
+            yield chunk
+    finally:
+        # client went away mid download: close the generator so its cursor is released too
+        if hasattr(iterator, "close"):
+            await sync_to_async(iterator.close)()
+
+
+def streaming_response(request, content, **kwargs):
+    """StreamingHttpResponse over the sync iterable `content`, async iterated when served through ASGI"""
+    if isinstance(request, ASGIRequest):
+        content = _achunks(content)
+    return StreamingHttpResponse(content, **kwargs)
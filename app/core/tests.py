@@ -1,3 +1,949 @@
-from django.test import TestCase
+import calendar
+import datetime as dt
+import io
+import json
+import os
+import tempfile
+import time
+import zoneinfo
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, tag
+from django.urls import reverse
+from django.utils import timezone
+
+from .management.commands.benchmark import DEADLINE_LIMIT_US, LIMITS_MS, Command as BenchmarkCommand
+from .management.commands.seed_benchmark import ADMIN_USERNAME, USER_PREFIX
+from .management.commands.sweep_expired_grants import Command as SweepCommand
+from .entries import EntryTable
+from .grants import GrantImporter, read_rows
+from .metrics import QueryBudgetExceeded
+from .models import ArchivedGrant, DeadlineOccurrence, ReminderOutbox, Report, ReportEntry, TimeSlot, User, UserDeadline, UserReportAccess
+from .pagination import KeysetPaginator, encode_cursor
+from .permissions import has_report_role
+from .recurrence import Recurrence, validate_rule
+from . import reminders
+
+
+# ---------- fixtures ----------
+def make_reports(count, slots=None, start=0):
+    """`count` reports cycling through every cadence and the given time slots (all of them need a slot)"""
+    slots = slots or [TimeSlot.objects.create(time=dt.time(h, 30)) for h in (0, 9, 17, 23)]
+    cadences = ["Daily", "Weekly", "Monthly", "Custom"]
+    reports = []
+    for i in range(start, start + count):
+        cadence = cadences[i % len(cadences)]
+        reports.append(Report.objects.create(
+            name=f"Report {i:03d}",
+            slug=f"report-{i:03d}",
+            cadence=cadence,
+            day_of_week_deadline=i % 7 if cadence == "Weekly" else None,
+            day_of_month_deadline=i % 28 + 1 if cadence == "Monthly" else None,
+            recurrence_rule="FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1" if cadence == "Custom" else "",
+            time_deadline=slots[i % len(slots)],
+        ))
+    return reports
+
+
+def grant(user, reports, role="edit"):
+    for report in reports:
+        UserReportAccess.objects.create(user=user, report=report, role=role)
+
+
+# ---------- query budgets (CORE_QUERY_BUDGETS) ----------
+@override_settings(CORE_QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """
+    every budgeted url name, requested with a full page of data and a cold cache (the expensive path),
+        so a view that starts querying per row or adds a query fails here instead of in production
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reports = make_reports(60)
+        cls.user = User.objects.create_user("alice", "alice@example.com", "pw", first_name="Alice")
+        grant(cls.user, cls.reports)
+        cls.staff = User.objects.create_user("staff", "staff@example.com", "pw", is_staff=True)
+        others = [User.objects.create_user(f"user{i}", f"user{i}@example.com") for i in range(60)]
+        for other in others:
+            grant(other, cls.reports[:3], role="view")
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user, name, *args):
+        self.client.force_login(user)
+        response = self.client.get(reverse(name, args=args))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_home(self):
+        self.get(self.user, "home")
+
+    def test_my_reports(self):
+        self.get(self.user, "my_reports")
+
+    def test_my_settings(self):
+        self.get(self.user, "my_settings")
+
+    def test_edit_my_settings(self):
+        self.get(self.user, "edit_my_settings")
+
+    def test_admin_report_list(self):
+        self.get(self.staff, "admin_report_list")
+
+    def test_admin_report_detail(self):
+        self.get(self.staff, "admin_report_detail", self.reports[0].slug)
+
+    def test_every_budget_is_covered(self):
+        from django.conf import settings
+        tested = {name[len("test_"):] for name in dir(self) if name.startswith("test_")}
+        self.assertLessEqual(set(settings.CORE_QUERY_BUDGETS), tested)
+
+    @override_settings(CORE_QUERY_BUDGETS={"my_settings": 0})
+    def test_exceeded_budget_fails(self):
+        self.client.force_login(self.user)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse("my_settings"))
+
+
+# ---------- dashboard (home) ----------
+class HomeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reports = make_reports(4)
+        cls.user = User.objects.create_user("alice", "alice@example.com")
+        grant(cls.user, cls.reports)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def report_names(self, **params):
+        response = self.client.get(reverse("home"), params)
+        self.assertEqual(response.status_code, 200)
+        return [row["report_name"] for row in response.context["report_data"]]
+
+    def test_due_within_filters_the_deadlines(self):
+        self.assertEqual(len(self.report_names()), 4)
+        self.assertIn("Report 000", self.report_names(due_within=25))       # daily
+        self.assertEqual(self.report_names(due_within=0), [])
+
+    def test_huge_due_within_is_clamped(self):
+        self.assertEqual(len(self.report_names(due_within=10 ** 8)), 4)
+        self.assertEqual(len(self.report_names(due_within="9" * 40)), 4)
+
+
+    def test_passed_deadlines_stay_until_refresh_deadlines_runs(self):
+        expected = dict(self.deadlines())
+        UserDeadline.objects.filter(user=self.user, report__in=self.reports[:2]).update(
+            deadline=timezone.now() - dt.timedelta(days=3)
+        )
+        self.assertEqual(dict(self.deadlines()), expected)
+        my_reports = self.client.get(reverse("my_reports")).context["page_obj"].object_list
+        self.assertEqual({a.report.name: a.local_deadline for a in my_reports}, expected)
+        self.assertEqual(UserDeadline.objects.filter(deadline__lt=timezone.now()).count(), 2)     # nothing written
+
+    def test_passed_deadlines_are_paginated_in_order(self):
+        reports = make_reports(56, slots=list(TimeSlot.objects.all()), start=4)
+        grant(self.user, reports)
+        UserDeadline.objects.filter(report__in=reports[::3]).update(deadline=timezone.now() - dt.timedelta(days=3))
+
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(reverse("home"), {"cursor": cursor} if cursor else {})
+            pages.append([(row["deadline"], row["report_name"]) for row in response.context["report_data"]])
+            cursor = response.context["page_obj"].next_cursor
+            if cursor is None:
+                break
+        rows = [row for page in pages for row in page]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(len(rows), 60)
+        self.assertEqual(len({name for _, name in rows}), 60)
+        self.assertEqual([dt.datetime.fromisoformat(d) for d, _ in rows], sorted(dt.datetime.fromisoformat(d) for d, _ in rows))
+
+    def deadlines(self):
+        response = self.client.get(reverse("home"))
+        return [(row["report_name"], dt.datetime.fromisoformat(row["deadline"])) for row in response.context["report_data"]]
+
+# ---------- keyset pagination (core.pagination) ----------
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_reports(23)        # 4 cadences -> long runs of tied keys
+
+    def paginator(self, per_page=5):
+        return KeysetPaginator(Report.objects.all(), per_page, ordering=["cadence", "pk"])
+
+    def expected(self):
+        return list(Report.objects.order_by("cadence", "pk").values_list("pk", flat=True))
+
+    def test_forward_and_back_across_tied_keys(self):
+        paginator = self.paginator()
+        pages, page = [], paginator.get_page()
+        self.assertFalse(page.has_previous)
+        while True:
+            pages.append([r.pk for r in page])
+            if not page.has_next:
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual([pk for p in pages for pk in p], self.expected())
+        self.assertEqual([len(p) for p in pages], [5, 5, 5, 5, 3])
+
+        backwards = []
+        while page.has_previous:
+            page = paginator.get_page(page.previous_cursor)
+            backwards.append([r.pk for r in page])
+            self.assertTrue(page.has_next)
+        self.assertEqual(backwards, pages[-2::-1])
+        self.assertFalse(page.has_previous)
+
+    def test_extra_rows_are_merged_in_order(self):
+        reports = list(Report.objects.order_by("cadence", "pk"))
+        extra = [reports.pop(i) for i in (20, 9, 3, 0)]     # pretend the db doesn't have these yet
+        paginator = KeysetPaginator(Report.objects.exclude(pk__in=[r.pk for r in extra]), 5, ordering=["cadence", "pk"])
+
+        seen, page = [], paginator.get_page(extra=extra)
+        while True:
+            seen += [r.pk for r in page]
+            if not page.has_next:
+                break
+            page = paginator.get_page(page.next_cursor, extra=extra)
+        self.assertEqual(seen, self.expected())
+        previous = paginator.get_page(page.previous_cursor, extra=extra)
+        self.assertEqual([r.pk for r in previous], self.expected()[15:20])
+
+    def test_invalid_cursors_give_the_first_page(self):
+        first = [r.pk for r in self.paginator().get_page()]
+        for cursor in (
+            "garbage",
+            "%%%",
+            encode_cursor(["Daily"], "n"),                  # wrong number of keys
+            encode_cursor(["Daily", "x"], "n"),             # not a pk
+            encode_cursor(["Daily", None], "n"),
+            encode_cursor(["Daily", 3], "sideways"),
+            encode_cursor([["Daily"], {"pk": 3}], "n"),
+        ):
+            with self.subTest(cursor):
+                self.assertEqual([r.pk for r in self.paginator().get_page(cursor)], first)
+
+    def test_tampered_cursor_on_a_view(self):
+        staff = User.objects.create_user("staff", "staff@example.com", is_staff=True)
+        self.client.force_login(staff)
+        for cursor in ("garbage", encode_cursor([None, "x"], "n"), encode_cursor([{"a": 1}, [2]], "p")):
+            with self.subTest(cursor):
+                response = self.client.get(reverse("admin_report_list"), {"cursor": cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context["page_obj"]), 23)
+
+    def test_datetime_keys_keep_microseconds(self):
+        user = User.objects.create_user("alice", "alice@example.com")
+        grant(user, Report.objects.all())
+        base = timezone.now().replace(microsecond=0) + dt.timedelta(days=1)
+        for i, row in enumerate(UserDeadline.objects.order_by("pk")):
+            row.deadline = base + dt.timedelta(microseconds=i % 3)     # ties and sub-second differences
+            row.save()
+        paginator = KeysetPaginator(UserDeadline.objects.select_related("report"), 4, ordering=["deadline", "report__name"])
+        seen, page = [], paginator.get_page()
+        while True:
+            seen += [d.pk for d in page]
+            if not page.has_next:
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(seen, list(UserDeadline.objects.order_by("deadline", "report__name").values_list("pk", flat=True)))
+
+
+# ---------- grant import (core.grants) ----------
+class GrantImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.report = make_reports(1)[0]
+        cls.user = User.objects.create_user("alice", "alice@example.com")
+
+    def run_import(self, text, fmt="csv"):
+        return GrantImporter().run(read_rows(io.StringIO(text), fmt))
+
+    def test_naive_expiry_is_utc_whatever_the_active_time_zone(self):
+        csv_text = "username,report,role,expires_at\nalice,report-000,view,2030-01-01T12:00:00\n"
+        with timezone.override("America/Los_Angeles"):
+            self.run_import(csv_text)
+        access = UserReportAccess.objects.get(user=self.user)
+        self.assertEqual(access.expires_at, dt.datetime(2030, 1, 1, 12, tzinfo=dt.timezone.utc))
+
+    def test_error_lines_match_the_file(self):
+        csv_text = "username,report,role,expires_at\nalice,report-000,view,\nbob,report-000,view,\nalice,nope,edit,\n"
+        importer = self.run_import(csv_text)
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual([line for line, _ in importer.errors], [3, 4])
+
+        jsonl_text = '{"username": "alice", "report": "report-000"}\n\n{"username": "bob", "report": "report-000"}\n'
+        self.assertEqual([line for line, _ in self.run_import(jsonl_text, "jsonl").errors], [3])
+
+
+    def test_unreadable_jsonl_lines_are_row_errors(self):
+        jsonl_text = (
+            '{"username": "alice", "report": "report-000"\n'        # not valid JSON
+            '[1, 2]\n'
+            '{"username": ["alice"], "report": "report-000", "expires_at": 5}\n'
+            '{"username": "alice", "report": "report-000", "role": "view"}\n'
+        )
+        importer = self.run_import(jsonl_text, "jsonl")
+        self.assertEqual(importer.imported, 1)
+        errors = dict(importer.errors)
+        self.assertEqual(set(errors), {1, 2, 3})
+        self.assertIn("invalid JSON", errors[1])
+        self.assertIn("expected a JSON object", errors[2])
+        self.assertEqual(UserReportAccess.objects.get(user=self.user).role, "view")
+
+    def test_admin_reports_a_file_that_isnt_utf8(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile("grants.csv", "username,report\nalice,report-000\nj\xf6rg,report-000\n".encode("latin-1"))
+        response = self.client.post(reverse("admin:core_userreportaccess_import"), {"file": upload, "format": "csv"}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("isn't UTF-8", " ".join(str(m) for m in response.context["messages"]))
+
+# ---------- report roles (core.permissions) ----------
+class ReportRoleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.report = make_reports(1)[0]
+        cls.user = User.objects.create_user("alice", "alice@example.com")
+
+    def fresh_user(self):
+        """the user as a new request would load it (no per-request roles)"""
+        return User.objects.get(pk=self.user.pk)
+
+    def test_downgrade_and_revoke_take_effect_on_the_next_check(self):
+        access = UserReportAccess.objects.create(user=self.user, report=self.report, role="edit")
+        self.assertTrue(has_report_role(self.fresh_user(), self.report, "edit"))
+
+        access.role = "view"
+        access.save()
+        self.assertFalse(has_report_role(self.fresh_user(), self.report, "edit"))
+        self.assertTrue(has_report_role(self.fresh_user(), self.report, "view"))
+
+        access.delete()
+        self.assertFalse(has_report_role(self.fresh_user(), self.report, "view"))
+
+    def test_role_is_cached_between_requests(self):
+        UserReportAccess.objects.create(user=self.user, report=self.report, role="owner")
+        has_report_role(self.fresh_user(), self.report, "owner")
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(has_report_role(user, self.report, "owner"))
+
+    def test_expired_grant_gives_no_role(self):
+        now = timezone.now()
+        UserReportAccess.objects.create(user=self.user, report=self.report, role="edit", expires_at=now - dt.timedelta(minutes=1))
+        self.assertFalse(has_report_role(self.fresh_user(), self.report, "view"))
+        self.assertFalse(UserReportAccess.objects.active().exists())
+
+    def test_role_ends_when_the_grant_expires(self):
+        expires_at = timezone.now() + dt.timedelta(hours=1)
+        UserReportAccess.objects.create(user=self.user, report=self.report, role="edit", expires_at=expires_at)
+        self.assertTrue(has_report_role(self.fresh_user(), self.report, "edit"))
+        with mock.patch("django.utils.timezone.now", return_value=expires_at + dt.timedelta(seconds=1)):
+            self.assertFalse(has_report_role(self.fresh_user(), self.report, "edit"))       # cached roles included
+
+
+class SweepExpiredGrantsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reports = make_reports(3)
+        cls.user = User.objects.create_user("alice", "alice@example.com")
+        now = timezone.now()
+        cls.expired = [
+            UserReportAccess.objects.create(user=cls.user, report=r, role="view", expires_at=now - dt.timedelta(days=i + 1))
+            for i, r in enumerate(cls.reports[:2])
+        ]
+        cls.active = UserReportAccess.objects.create(user=cls.user, report=cls.reports[2], expires_at=now + dt.timedelta(days=1))
+        cls.forever = UserReportAccess.objects.create(
+            user=User.objects.create_user("bob", "bob@example.com"), report=cls.reports[0],
+        )
+
+    def sweep(self, *args):
+        out = io.StringIO()
+        call_command("sweep_expired_grants", *args, "--chunk-size=1", stdout=out)
+        return out.getvalue()
+
+    def test_archives_and_deletes_only_expired_grants(self):
+        self.assertIn("removed 2 expired grants", self.sweep())
+        self.assertEqual(set(UserReportAccess.objects.values_list("pk", flat=True)), {self.active.pk, self.forever.pk})
+        self.assertEqual(
+            set(ArchivedGrant.objects.values_list("source_id", "username", "report_slug", "role")),
+            {(g.pk, "alice", g.report.slug, "view") for g in self.expired},
+        )
+        self.assertFalse(UserDeadline.objects.filter(access_id__in=[g.pk for g in self.expired]).exists())
+
+    def test_archiving_twice_keeps_one_row(self):
+        """a concurrent run got to archive the grant first (its delete didn't commit yet)"""
+        grant = self.expired[0]
+        ArchivedGrant.objects.create(
+            source_id=grant.pk, username="alice", report_slug=grant.report.slug, role="view",
+            granted_at=grant.granted_at, expires_at=grant.expires_at,
+        )
+        self.sweep()
+        self.assertEqual(ArchivedGrant.objects.filter(source_id=grant.pk).count(), 1)
+        self.assertEqual(ArchivedGrant.objects.count(), 2)
+
+    def test_grant_extended_after_it_was_listed_is_kept(self):
+        grant = self.expired[0]
+        sweep = SweepCommand.sweep
+
+        def extend_then_sweep(command, chunk, *args):
+            UserReportAccess.objects.filter(pk=grant.pk).update(expires_at=timezone.now() + dt.timedelta(days=30))
+            return sweep(command, chunk, *args)
+
+        with mock.patch.object(SweepCommand, "sweep", extend_then_sweep):
+            self.sweep()
+        self.assertTrue(UserReportAccess.objects.filter(pk=grant.pk).exists())
+        self.assertFalse(ArchivedGrant.objects.filter(source_id=grant.pk).exists())
+
+    def test_jsonl_archive_and_no_archive(self):
+        with tempfile.NamedTemporaryFile("r", suffix=".jsonl") as archive:
+            self.sweep("--archive", archive.name, "--no-archive")
+            lines = [json.loads(line) for line in archive]
+        self.assertEqual(sorted(line["report"] for line in lines), sorted(g.report.slug for g in self.expired))
+        self.assertFalse(ArchivedGrant.objects.exists())
+        self.assertEqual(UserReportAccess.objects.count(), 2)
+
+    def test_dry_run_only_counts(self):
+        self.assertIn("2 expired grants", self.sweep("--dry-run"))
+        self.assertEqual(UserReportAccess.objects.count(), 4)
+
+
+# ---------- data entry (core.entries, report_entries) ----------
+class EntryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.report = make_reports(1)[0]
+        cls.editor = User.objects.create_user("editor", "editor@example.com")
+        cls.viewer = User.objects.create_user("viewer", "viewer@example.com")
+        grant(cls.editor, [cls.report], role="edit")
+        grant(cls.viewer, [cls.report], role="view")
+        cls.url = reverse("report_entries", args=[cls.report.slug])
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, rows, user=None):
+        self.client.force_login(user or self.editor)
+        return self.client.post(self.url, json.dumps(rows), content_type="application/json")
+
+    def rows(self, count=3, **changes):
+        return [
+            {"row_key": f"k{i}", "entry_date": f"2026-01-{i + 1:02d}", "amount": f"{i}.50", "notes": "", **changes}
+            for i in range(count)
+        ]
+
+    def test_invalid_rows_reject_the_table_with_row_errors(self):
+        rows = self.rows()
+        rows[0]["entry_date"] = "yesterday"
+        rows[1]["amount"] = "1.234"
+        rows.append({"row_key": "k2", "entry_date": "2026-01-05", "amount": "1", "email": "nobody@example.com"})
+
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 400)
+        errors = {e["row"]: e["errors"] for e in response.json()["errors"]}
+        self.assertEqual(set(errors), {0, 1, 3})
+        self.assertIn("entry_date", errors[0])
+        self.assertIn("amount", errors[1])
+        self.assertEqual(set(errors[3]), {"row_key", "email"})      # duplicate key, unknown user
+        self.assertFalse(ReportEntry.objects.exists())
+
+    def test_view_role_cannot_submit(self):
+        self.assertEqual(self.post(self.rows(), user=self.viewer).status_code, 403)
+        self.assertFalse(ReportEntry.objects.exists())
+
+    def test_counts_created_updated_unchanged(self):
+        body = self.post(self.rows()).json()
+        self.assertEqual((body["created"], body["updated"], body["unchanged"]), (3, 0, 0))
+
+        rows = self.rows(4, version=1)
+        rows[0]["amount"] = "99.00"
+        rows[3]["version"] = None
+        body = self.post(rows).json()
+        self.assertEqual((body["created"], body["updated"], body["unchanged"]), (1, 1, 2))
+        self.assertEqual(ReportEntry.objects.get(row_key="k0").amount, 99)
+
+    def test_dry_run_writes_nothing(self):
+        self.client.force_login(self.editor)
+        response = self.client.post(f"{self.url}?dry_run=1", json.dumps(self.rows()), content_type="application/json")
+        self.assertEqual(response.json()["valid"], 3)
+        self.assertFalse(ReportEntry.objects.exists())
+
+    # compare-and-swap on ReportEntry.version
+    def edit(self, amount, version=1):
+        return [{**self.rows(1)[0], "amount": amount, "version": version}]
+
+    def test_changed_row_bumps_the_version(self):
+        self.post(self.rows())
+        before = ReportEntry.objects.get(row_key="k0")
+
+        body = self.post(self.edit("5.00")).json()
+        self.assertEqual((body["updated"], body["conflicts"]), (1, []))
+        after = ReportEntry.objects.get(row_key="k0")
+        self.assertEqual((after.version, after.amount), (2, 5))
+        self.assertGreater(after.updated_at, before.updated_at)
+
+    def test_unchanged_row_is_not_written(self):
+        self.post(self.rows())
+        before = ReportEntry.objects.get(row_key="k0")
+
+        body = self.post(self.rows(version=1)).json()
+        self.assertEqual((body["updated"], body["unchanged"]), (0, 3))
+        after = ReportEntry.objects.get(row_key="k0")
+        self.assertEqual((after.version, after.updated_at), (1, before.updated_at))
+
+    def test_stale_version_is_a_conflict(self):
+        self.post(self.rows())
+        self.post(self.edit("5.00"))
+
+        body = self.post(self.edit("7.00")).json()     # read version 1 as well, it's 2 by now
+        self.assertEqual(body["updated"], 0)
+        [conflict] = body["conflicts"]
+        self.assertEqual((conflict["submitted_version"], conflict["current"]["version"]), (1, 2))
+        stored = ReportEntry.objects.get(row_key="k0")
+        self.assertEqual((stored.version, stored.amount), (2, 5))
+
+    def test_write_between_diff_and_update_is_a_conflict(self):
+        """someone else saves the row after the diff read version 1 but before the guarded UPDATE"""
+        self.post(self.rows())
+        compare_and_swap = EntryTable._compare_and_swap
+
+        def concurrent_write(table, *args):
+            ReportEntry.objects.filter(row_key="k0").update(amount=6, version=F("version") + 1)
+            compare_and_swap(table, *args)
+
+        table = EntryTable(self.report, self.editor, self.edit("5.00"))
+        with mock.patch.object(EntryTable, "_compare_and_swap", concurrent_write):
+            table.save()
+        self.assertEqual((table.updated, len(table.conflicts)), (0, 1))
+        stored = ReportEntry.objects.get(row_key="k0")
+        self.assertEqual((stored.version, stored.amount), (2, 6))
+
+
+# ---------- columnar export (export_entries) ----------
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.report = make_reports(1)[0]
+        cls.owner = User.objects.create_user("owner", "owner@example.com")
+        cls.editor = User.objects.create_user("editor", "editor@example.com")
+        grant(cls.owner, [cls.report], role="owner")
+        grant(cls.editor, [cls.report], role="edit")
+        for i, user in enumerate([cls.owner, cls.editor, cls.editor]):
+            ReportEntry.objects.create(
+                report=cls.report, user=user, row_key=f"k{i}", entry_date=dt.date(2026, 1, i + 1), amount=f"{i}.50",
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def export(self, fmt="arrow", **headers):
+        return self.client.get(reverse("export_entries"), {"format": fmt}, headers=headers)
+
+    def test_arrow_stream(self):
+        import pyarrow as pa
+
+        response = self.export()
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.arrow.stream")
+        table = pa.ipc.open_stream(b"".join(response.streaming_content)).read_all()
+        self.assertEqual(table.column_names, ["report", "row_key", "email", "entry_date", "amount", "notes", "version", "updated_at"])
+        rows = table.to_pylist()
+        self.assertEqual([row["row_key"] for row in rows], ["k0", "k1", "k2"])
+        self.assertEqual(rows[1]["report"], "report-000")
+        self.assertEqual(rows[1]["email"], "editor@example.com")
+        self.assertEqual(rows[1]["entry_date"], dt.date(2026, 1, 2))
+        self.assertEqual(str(rows[1]["amount"]), "1.50")
+
+    def test_parquet_file(self):
+        import pyarrow.parquet as pq
+
+        response = self.export("parquet")
+        self.assertIn("entries.parquet", response["Content-Disposition"])
+        table = pq.read_table(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(table.column("row_key").to_pylist(), ["k0", "k1", "k2"])
+        self.assertEqual(table.column("email").to_pylist()[0], "owner@example.com")
+
+    def test_non_owner_only_gets_their_rows(self):
+        import pyarrow as pa
+
+        self.client.force_login(self.editor)
+        table = pa.ipc.open_stream(b"".join(self.export().streaming_content)).read_all()
+        self.assertEqual(table.column("row_key").to_pylist(), ["k1", "k2"])
+
+    def test_unchanged_export_is_not_modified(self):
+        etag = self.export()["ETag"]
+        response = self.export(If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.export("parquet")["ETag"], etag)      # per format
+
+    def test_etag_changes_with_the_rows(self):
+        etag = self.export()["ETag"]
+        ReportEntry.objects.filter(row_key="k0").update(amount=9, updated_at=timezone.now())
+        self.assertEqual(self.export(If_None_Match=etag).status_code, 200)
+
+    def test_etag_changes_with_report_slug_and_user_email(self):
+        etag = self.export()["ETag"]
+        self.report.slug = "renamed"
+        self.report.save()
+        response = self.export(If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.editor.email = "editor@example.org"
+        self.editor.save()
+        self.assertEqual(self.export(If_None_Match=etag).status_code, 200)
+
+    def test_login_keeps_the_etag(self):
+        etag = self.export()["ETag"]
+        self.owner.last_login = timezone.now()
+        self.owner.save(update_fields=["last_login"])       # what a login writes
+        self.assertEqual(self.export(If_None_Match=etag).status_code, 304)
+
+
+# ---------- live deadlines (deadline_events) ----------
+class DeadlineEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("alice", "alice@example.com")
+        grant(cls.user, make_reports(2))
+
+    def test_not_streamed_under_wsgi(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("deadline_events"))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    @override_settings(CORE_EVENTS_MAX_AGE=0)
+    async def test_streamed_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("deadline_events"))
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "text/event-stream"))
+        self.assertEqual([chunk async for chunk in response.streaming_content], [b"retry: 5000\n\n"])
+
+
+# ---------- recurrence rules (core.recurrence) ----------
+def brute_force_next(day, matches, inclusive=True):
+    """first day on/after `day` (after with inclusive=False) for which matches(day) holds, one day at a time"""
+    day = day if inclusive else day + dt.timedelta(days=1)
+    while not matches(day):
+        day += dt.timedelta(days=1)
+    return day
+
+
+def last_business_day(day):
+    last = dt.date(day.year, day.month, calendar.monthrange(day.year, day.month)[1])
+    while last.weekday() >= 5:
+        last -= dt.timedelta(days=1)
+    return day == last
+
+
+def second_tuesday(day):
+    return day.weekday() == 1 and 8 <= day.day <= 14
+
+
+class RecurrenceTests(SimpleTestCase):
+    START, DAYS = dt.date(2024, 1, 1), 4 * 366     # covers a leap year and every weekday/month length combination
+
+    def assertMatchesBruteForce(self, text, matches):
+        rule = Recurrence(text)
+        for offset in range(self.DAYS):
+            day = self.START + dt.timedelta(days=offset)
+            for inclusive in (True, False):
+                self.assertEqual(
+                    rule.next_date(day, inclusive), brute_force_next(day, matches, inclusive),
+                    f"{text} from {day} (inclusive={inclusive})",
+                )
+
+    def test_last_business_day(self):
+        self.assertMatchesBruteForce("FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1", last_business_day)
+
+    def test_nth_weekday(self):
+        self.assertMatchesBruteForce("FREQ=MONTHLY;BYDAY=2TU", second_tuesday)
+
+    def test_month_days_and_weekdays(self):
+        self.assertMatchesBruteForce("FREQ=MONTHLY;BYMONTHDAY=1,-1", lambda d: d.day == 1 or (d + dt.timedelta(days=1)).day == 1)
+        self.assertMatchesBruteForce("FREQ=WEEKLY;BYDAY=MO,TH", lambda d: d.weekday() in (0, 3))
+        self.assertMatchesBruteForce("FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR", lambda d: d.weekday() < 5)
+
+    def test_wall_clock_time_is_kept_across_dst(self):
+        new_york = zoneinfo.ZoneInfo("America/New_York")
+        rule = Recurrence("FREQ=DAILY")
+        now = dt.datetime(2026, 3, 7, 8, 0, tzinfo=new_york)          # the day before clocks go forward
+        deadlines = rule.next_n_occurrences(now, dt.time(9, 0), 3)
+        self.assertEqual([d.astimezone(new_york).hour for d in deadlines], [9, 9, 9])
+        self.assertEqual(
+            [d.utcoffset() for d in deadlines],
+            [dt.timedelta(hours=-5), dt.timedelta(hours=-4), dt.timedelta(hours=-4)],
+        )
+
+        fall = rule.next_after(dt.datetime(2026, 11, 1, 0, 30, tzinfo=new_york), dt.time(9, 0))
+        self.assertEqual((fall.date(), fall.utcoffset()), (dt.date(2026, 11, 1), dt.timedelta(hours=-5)))
+
+    def test_time_skipped_by_dst_lands_an_hour_later(self):
+        new_york = zoneinfo.ZoneInfo("America/New_York")
+        now = dt.datetime(2026, 3, 7, 12, 0, tzinfo=new_york)
+        deadline = Recurrence("FREQ=DAILY").next_after(now, dt.time(2, 30))     # 02:30 doesn't exist on March 8
+        self.assertEqual(deadline.astimezone(dt.timezone.utc), dt.datetime(2026, 3, 8, 7, 30, tzinfo=dt.timezone.utc))
+        self.assertEqual(deadline.astimezone(dt.timezone.utc).astimezone(new_york).time(), dt.time(3, 30))
+
+    def test_today_counts_until_the_time_passes(self):
+        rule = Recurrence("FREQ=MONTHLY;BYDAY=2TU")
+        morning = dt.datetime(2026, 1, 13, 8, 0, tzinfo=dt.timezone.utc)        # the second Tuesday
+        self.assertEqual(rule.next_after(morning, dt.time(9, 0)).date(), dt.date(2026, 1, 13))
+        evening = morning.replace(hour=10)
+        self.assertEqual(rule.next_after(evening, dt.time(9, 0)).date(), dt.date(2026, 2, 10))
+
+    def test_schedule_key_fits_the_occurrence_column(self):
+        longest = Report._meta.get_field("recurrence_rule").max_length
+        report = Report(cadence="Custom", recurrence_rule="X" * longest, time_deadline=TimeSlot(time=dt.time(23, 59)))
+        max_length = DeadlineOccurrence._meta.get_field("schedule_key").max_length
+        self.assertLessEqual(len(report.schedule_key()), max_length)
+
+        report.recurrence_rule = "FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1"
+        key = report.schedule_key()
+        self.assertLessEqual(len(key), max_length)
+        report.recurrence_rule = "FREQ=MONTHLY;BYDAY=MO,TU,WE,TH;BYSETPOS=-1"
+        self.assertNotEqual(report.schedule_key(), key)
+
+    def test_validate_rule_accepts_the_documented_rules(self):
+        for text in (
+            "FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1",
+            "FREQ=MONTHLY;BYDAY=2TU",
+            "FREQ=MONTHLY;BYMONTHDAY=1,15",
+            "FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR",
+            "freq=weekly; byday=mo,th;",
+        ):
+            validate_rule(text)
+
+    def test_validate_rule_rejects_unsupported_parts(self):
+        for text in (
+            "FREQ=YEARLY;BYMONTH=1",
+            "FREQ=HOURLY",
+            "FREQ=DAILY;INTERVAL=2",
+            "FREQ=DAILY;BYHOUR=9",
+            "FREQ=MONTHLY;BYDAY=MO;COUNT=3",
+            "FREQ=MONTHLY;BYDAY=MO;UNTIL=20270101",
+            "FREQ=WEEKLY;BYDAY=MO;WKST=SU",
+        ):
+            with self.subTest(text), self.assertRaisesMessage(ValidationError, "invalid recurrence rule"):
+                validate_rule(text)
+
+    def test_validate_rule_rejects_malformed_rules(self):
+        for text in (
+            "",
+            "FREQ",
+            "BYDAY=MO",                             # no FREQ
+            "FREQ=DAILY;FREQ=WEEKLY",
+            "FREQ=WEEKLY",                          # weekly without BYDAY
+            "FREQ=WEEKLY;BYDAY=XX",
+            "FREQ=DAILY;BYDAY=2TU",                 # numbered BYDAY outside MONTHLY
+            "FREQ=MONTHLY",
+            "FREQ=MONTHLY;BYMONTHDAY=0",
+            "FREQ=MONTHLY;BYMONTHDAY=32",
+            "FREQ=MONTHLY;BYDAY=6MO",
+            "FREQ=MONTHLY;BYMONTHDAY=31;BYDAY=5MO;BYSETPOS=2",
+            "FREQ=MONTHLY;BYMONTHDAY=30;BYDAY=FR;BYSETPOS=2",
+        ):
+            with self.subTest(text), self.assertRaisesMessage(ValidationError, "invalid recurrence rule"):
+                validate_rule(text)
+
+
+# ---------- deadline calendar (DeadlineOccurrence, extend_deadline_calendar) ----------
+class DeadlineCalendarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.daily, cls.weekly, cls.monthly, cls.custom = make_reports(4)
+
+    def upcoming(self, report, from_dt=None):
+        now = from_dt or timezone.now()
+        return list(report.occurrences.filter(due_at__gte=now).values_list("due_at", flat=True))
+
+    def extend(self, *args):
+        out = io.StringIO()
+        call_command("extend_deadline_calendar", *args, stdout=out)
+        return out.getvalue()
+
+    def test_new_reports_get_the_horizon(self):
+        now = timezone.now()
+        daily = self.upcoming(self.daily, now)
+        self.assertIn(len(daily), (90, 91))
+        self.assertEqual(daily[:5], self.daily.next_n_occurrences(5, from_dt=now))
+        self.assertEqual(self.upcoming(self.custom, now)[:3], self.custom.next_n_occurrences(3, from_dt=now))
+
+    def test_extend_is_idempotent(self):
+        rows = DeadlineOccurrence.objects.count()
+        self.assertIn("created 0 occurrences, regenerated 0 changed schedules", self.extend())
+        self.assertIn("created 0 occurrences, regenerated 0 changed schedules", self.extend())
+        self.assertEqual(DeadlineOccurrence.objects.count(), rows)
+
+    def test_extend_only_adds_past_the_last_occurrence(self):
+        before = dict(DeadlineOccurrence.objects.values_list("pk", "due_at"))
+        later = timezone.now() + dt.timedelta(days=10)
+        result = DeadlineOccurrence.objects.extend(90, from_dt=later, reports=[self.daily])
+        self.assertEqual(result, {"created": 10, "regenerated": 0})
+        self.assertLessEqual(before.items(), dict(DeadlineOccurrence.objects.values_list("pk", "due_at")).items())
+        self.assertEqual(DeadlineOccurrence.objects.extend(90, from_dt=later, reports=[self.daily]), {"created": 0, "regenerated": 0})
+        due = self.upcoming(self.daily, later)
+        self.assertEqual(len(due), len(set(due)))
+
+    def test_schedule_change_replaces_upcoming_occurrences(self):
+        now = timezone.now()
+        past = DeadlineOccurrence.objects.create(
+            report=self.daily, due_at=now - dt.timedelta(days=1), schedule_key=self.daily.schedule_key(),
+        )
+        self.daily.cadence, self.daily.day_of_week_deadline = "Weekly", 2
+        self.daily.save()
+
+        upcoming = self.upcoming(self.daily, now)
+        self.assertEqual(upcoming[:4], self.daily.next_n_occurrences(4, from_dt=now))
+        self.assertTrue(all(d.astimezone(zoneinfo.ZoneInfo("America/New_York")).weekday() == 2 for d in upcoming))
+        self.assertEqual(
+            set(self.daily.occurrences.filter(due_at__gte=now).values_list("schedule_key", flat=True)),
+            {self.daily.schedule_key()},
+        )
+        self.assertTrue(DeadlineOccurrence.objects.filter(pk=past.pk).exists())     # history is kept
+        self.assertIn("regenerated 0", self.extend())
+
+    def test_rule_and_time_slot_changes_regenerate(self):
+        now = timezone.now()
+        self.custom.recurrence_rule = "FREQ=MONTHLY;BYDAY=2TU"
+        self.custom.save()
+        self.assertEqual(self.upcoming(self.custom, now)[:3], self.custom.next_n_occurrences(3, from_dt=now))
+
+        slot = self.monthly.time_deadline
+        slot.time = dt.time(11, 45)
+        slot.save()
+        self.monthly.refresh_from_db()
+        self.assertEqual(self.upcoming(self.monthly, now)[:2], self.monthly.next_n_occurrences(2, from_dt=now))
+
+    def test_deleted_time_slot_drops_upcoming_occurrences(self):
+        self.weekly.time_deadline.delete()
+        self.assertEqual(self.upcoming(self.weekly), [])
+
+
+# ---------- reminders (core.reminders) ----------
+class ReminderTests(TransactionTestCase):
+    """a TransactionTestCase so "no transaction while sending" can be checked (TestCase wraps everything in one)"""
+
+    def setUp(self):
+        cache.clear()
+        slot = TimeSlot.objects.create(time=dt.time(23, 30))
+        self.report = Report.objects.create(name="Daily", slug="daily", cadence="Daily", time_deadline=slot)
+        self.users = [User.objects.create_user(f"user{i}", f"user{i}@example.com") for i in range(5)]
+        for user in self.users:
+            grant(user, [self.report])
+
+    def test_enqueue_counts_only_its_own_inserts(self):
+        self.assertEqual(reminders.enqueue_reminders(25), 5)
+        self.assertEqual(reminders.enqueue_reminders(25), 0)
+        ReminderOutbox.objects.filter(user=self.users[0]).delete()
+        self.assertEqual(reminders.enqueue_reminders(25), 1)
+
+    def test_drain_sends_outside_a_transaction(self):
+        reminders.enqueue_reminders(25)
+        in_transaction = []
+        send_slice = reminders._send_slice
+
+        def checked_send_slice(batch):
+            in_transaction.append(connection.in_atomic_block)
+            return send_slice(batch)
+
+        with mock.patch.object(reminders, "_send_slice", checked_send_slice):
+            self.assertEqual(reminders.drain_outbox(batch_size=2, workers=1), (5, 0))
+        self.assertEqual(in_transaction, [False] * 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(ReminderOutbox.objects.exclude(status=ReminderOutbox.SENT).exists())
+        self.assertFalse(ReminderOutbox.objects.filter(leased_until__isnull=False).exists())
+
+    def test_leased_rows_are_skipped_until_the_lease_runs_out(self):
+        reminders.enqueue_reminders(25)
+        claimed = reminders.claim_batch(0, 2, lease_seconds=600)
+        self.assertEqual(len(claimed), 2)
+
+        self.assertEqual(reminders.drain_outbox(workers=1), (3, 0))     # another drainer meanwhile
+        ReminderOutbox.objects.filter(pk__in=[r.pk for r in claimed]).update(
+            leased_until=timezone.now() - dt.timedelta(seconds=1)       # the first one died
+        )
+        self.assertEqual(reminders.drain_outbox(workers=1), (2, 0))
+
+    def test_failed_sends_stay_pending_then_fail(self):
+        reminders.enqueue_reminders(25)
+
+        def failing(batch):
+            return [(reminder, "boom") for reminder in batch]
+
+        with mock.patch.object(reminders, "_send_slice", failing):
+            self.assertEqual(reminders.drain_outbox(workers=1, max_attempts=2), (0, 0))
+            self.assertEqual(reminders.drain_outbox(workers=1, max_attempts=2), (0, 5))
+        self.assertEqual(ReminderOutbox.objects.filter(status=ReminderOutbox.FAILED, attempts=2).count(), 5)
+
+
+# ---------- benchmarks (the `manage.py benchmark` measurements on a small seed) ----------
+@tag("benchmark")
+@skipUnless(os.environ.get("CORE_BENCHMARKS"), "timing tests, run with CORE_BENCHMARKS=1 manage.py test core --tag benchmark")
+class BenchmarkTests(TestCase):
+    """
+    p50/p99 latency of the core pages through the test client, warm and with the cache cleared before
+        every request, against the limits in the benchmark command (LIMITS_MS). Wall clock numbers are
+        too noisy for every test run on shared machines, so these are opt-in: run them when touching
+        the hot paths, and compare commits with `manage.py benchmark` on a full seed.
+    """
+    REQUESTS = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("seed_benchmark", users=200, reports=200, links_per_user=50, stdout=io.StringIO())
+        cls.users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by("pk")[:10])
+        cls.admin = User.objects.get(username=ADMIN_USERNAME)
+        cls.report = Report.objects.filter(user_links__isnull=False).order_by("pk").first()
+
+    def setUp(self):
+        self.bench = BenchmarkCommand()
+
+    def measure(self, clients, name, *args, cold=False):
+        url = reverse(name, args=args)
+        stats = self.bench.bench_view(clients, url, {"requests": self.REQUESTS, "cold": cold})
+        p50, p99 = LIMITS_MS[name]
+        label = f"{name} ({'cold' if cold else 'warm'}): {stats}"
+        self.assertLess(stats["p50_ms"], p50, label)
+        self.assertLess(stats["p99_ms"], p99, label)
+
+    def user_clients(self):
+        return [self.bench.client_for(user) for user in self.users]
+
+    def test_home(self):
+        self.measure(self.user_clients(), "home")
+        self.measure(self.user_clients(), "home", cold=True)
+
+    def test_my_reports(self):
+        self.measure(self.user_clients(), "my_reports")
+        self.measure(self.user_clients(), "my_reports", cold=True)
+
+    def test_admin_report_list(self):
+        self.measure([self.bench.client_for(self.admin)], "admin_report_list", cold=True)
+
+    def test_admin_report_detail(self):
+        self.measure([self.bench.client_for(self.admin)], "admin_report_detail", self.report.slug, cold=True)
+
+    def test_admin_changelist(self):
+        self.measure([self.bench.client_for(self.admin)], "admin:core_userreportaccess_changelist", cold=True)
+
+    def test_next_deadline_est(self):
+        reports = list(Report.objects.filter(time_deadline__isnull=False).select_related("time_deadline"))
+        started = time.perf_counter()
+        for i in range(10000):
+            reports[i % len(reports)].next_deadline_est()
+        per_call_us = (time.perf_counter() - started) / 10000 * 1e6
+        self.assertLess(per_call_us, DEADLINE_LIMIT_US)
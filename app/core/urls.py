@@ -9,7 +9,15 @@ urlpatterns = [
 
     # path for individual reports
     #path("reports/<slug:slug>/editor/", views.open_report_editor),
+    path("reports/<slug:slug>/entries/", views.report_entries, name="report_entries"),
+    path("entries/export/", views.export_entries, name="export_entries"),
     path("settings/", views.my_settings, name="my_settings"),
     path("settings/edit/", views.edit_my_settings, name="edit_my_settings"),
     #path("signup/", views.sign_up(), name="signup"),
+    path("metrics/", views.metrics, name="metrics"),
+    path("events/deadlines/", views.deadline_events, name="deadline_events"),
+
+    # staff views of report access
+    path("manage/reports/", views.admin_report_list, name="admin_report_list"),
+    path("manage/reports/<slug:slug>/", views.admin_report_detail, name="admin_report_detail"),
 ]
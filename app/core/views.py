@@ -1,80 +1,93 @@
-from django.shortcuts import render
-from django.http import HttpResponse
-from django.urls import reverse_lazy
-from django.views.generic import CreateView
-from django.contrib.auth.forms import UserCreationForm
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
-from django.core.paginator import Paginator
-from django.db.models import Count, Prefetch
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.db.models import Count
 from django.shortcuts import get_object_or_404, render, redirect
 
-from .models import Report, UserReportAccess, UserProfile, User
+from .models import Report, UserReportAccess, UserProfile, UserDeadline, get_zoneinfo, with_current_deadlines
 from .forms import ProfileForm
-from datetime import datetime
-from zoneinfo import ZoneInfo
+from .entries import (
+    ENTRY_FORMATS, EXPORT_FORMATS, EntryTable, TableError, entries_etag, entries_for, iter_entries,
+    iter_entries_arrow, read_table, visible_entries, write_entries_parquet,
+)
+from .permissions import has_report_role
+from .cache import afragment_version, aget_versions, ahome_key, version_key
+from .pagination import KeysetPage, KeysetPaginator
+from .streaming import streaming_response
+from . import metrics as request_metrics
+from datetime import timedelta
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from asgiref.sync import sync_to_async
 
+import asyncio
+import csv
+import json
 import logging
+import math
+import tempfile
 
 logger = logging.getLogger(__name__)  # use module name for clarity
 
+DUE_WITHIN_MAX_HOURS = 366 * 24     # ?due_within= is clamped to a year, larger windows overflow the datetime math
+
 
 
 # Create your views here.
 
-def home(request):
-    # AUTH CHECK FIRST!
-    if not request.user.is_authenticated:
+async def home(request):
+    # AUTH CHECK FIRST! (auser() -> no blocking session/user query on the event loop)
+    user = await request.auser()
+    if not user.is_authenticated:
         return redirect("login")
 
-    user = request.user
     profile=None
+    user_tz=None
 
-    # try and fetch custom profile for default django user object
+    # custom profile for default django user object (already loaded by UserTimezoneMiddleware)
     if user.is_authenticated:
-        try:
-            profile = UserProfile.objects.get(user=user)
+        profile = request.profile
+        if profile is not None:
             user_tz = profile.timezone or None
-            logger.error(">>>>>Found profile for %s with timezone %s", request.user.username, profile.timezone)
-        except UserProfile.DoesNotExist:
-            logger.error(">>>>>No profile found for user %s", request.user.username)
-            pass        # profile remains null... logic for hiding null profile in html
-
-        # >>>>>>> fetch reports and deadlines:
-        # user_links -> UserReportAcess Objects -> user
-        reports = reports = Report.objects.filter(user_links__user=user).order_by("day_of_week_deadline", "time_deadline")
+        # else: profile remains null... logic for hiding null profile in html
 
         report_data = []
         user_data = []
+        page_obj = None
+        fragment_key = None
         now = timezone.now()
 
 
         # only calculate time until deadline if user has a defined timezone
         if user_tz is not None and user_tz.strip().lower() != "none":
-            now = now.astimezone(ZoneInfo(user_tz))
-
-            # calcualte deadlines with a delta from users timezone
-            for r in reports:
-                # get report submission deadline in terms of users local tz
-                local_deadline = r.deadline_for_user(user_tz)
-                is_overdue = False
-
-                 # skip reports with missing deadline 
-                if not (local_deadline):
-                    is_overdue = False
-                    status_text = "No Deadline Defined"
-                    continue 
-
-                delta = local_deadline - now 
-                delta_seconds = int(delta.total_seconds())
-                
-                seconds_until_deadline = delta_seconds # for sorting 
+            now = now.astimezone(get_zoneinfo(user_tz))
+
+            # >>>>>>> fetch reports and deadlines:
+            due_within = request.GET.get("due_within", "")
+            due_within = min(int(due_within), DUE_WITHIN_MAX_HOURS) if due_within.isdigit() else None
+            (rows, page_obj), version = await asyncio.gather(
+                _dashboard_page(user, now, request.GET.get("cursor"), due_within),
+                afragment_version(user.pk),
+            )
+            # the table shows minute countdowns, so its cached fragment is good for the current minute
+            fragment_key = f"{version}:{request.GET.urlencode()}:{now:%Y%m%d%H%M}"
+
+            # countdowns are computed per request from the (cached) deadlines, in the users local tz
+            for report_name, deadline in rows:
+                local_deadline = deadline.astimezone(now.tzinfo)
+                delta_seconds = int((local_deadline - now).total_seconds())
+                is_overdue = delta_seconds <= 0
+
+                seconds_until_deadline = delta_seconds
                 
-                if delta_seconds <= 0:
-                    is_overdue = True
+                if is_overdue:
                     status_text=f"Overdue! (due at {str(local_deadline)})"
 
                 else: 
@@ -89,21 +102,150 @@ def home(request):
 
 
                 report_data.append({
-                    "report_name" : r.name,
+                    "report_name" : report_name,
+                    "deadline" : deadline.isoformat(),      # for the live countdown in base.html
                     "seconds_until_deadline" : seconds_until_deadline,
                     "status_text" : status_text,
                     "is_overdue" : is_overdue
                 })
 
-                user_data = {
-                    "user_first_name" : user.first_name,
-                    "user_location" : profile.location,
-                    "user_timezone" : profile.timezone
-                }
-        
-        # sort by nearest deadline
-        report_data.sort(key=lambda rpt : rpt['seconds_until_deadline'], reverse=False)
-        return render(request, "core/home.html", {"report_data" : report_data, "user_data" : user_data})
+            user_data = {
+                "user_first_name" : user.first_name,
+                "user_location" : profile.location,
+                "user_timezone" : profile.timezone
+            }
+
+        return render(request, "core/home.html", {
+            "report_data" : report_data, "user_data" : user_data, "page_obj" : page_obj, "fragment_key" : fragment_key,
+        })
+
+async def _dashboard_page(user, now, cursor=None, due_within=None):
+    """
+    one page of the user's (report name, deadline) rows + its KeysetPage.
+        deadlines are precomputed per (user, report) in UserDeadline and the db orders by nearest deadline
+        (skipping reports with missing deadline), so only one page is loaded. The page is cached until the
+        next deadline boundary and invalidated from core.signals when links/reports/profile change.
+        on a miss the page and the cache boundaries are fetched concurrently with the async ORM
+    """
+    key = await ahome_key(user.pk, cursor, due_within)
+    cached = await cache.aget(key)
+
+    if cached is None:
+        upcoming = UserDeadline.objects.for_user(user, now).filter(deadline__isnull=False)
+        # rows whose deadline passed before refresh_deadlines rolled them forward: same fallback as my_reports
+        passed = [
+            d async for d in UserDeadline.objects.passed_for_user(user, now).select_related("report", "report__time_deadline")
+        ]
+        if passed:
+            passed = [d for d in await sync_to_async(with_current_deadlines)(passed, from_dt=now, tz="UTC") if d.deadline]
+        deadlines, extra = upcoming, passed
+        if due_within is not None:
+            window_end = now + timedelta(hours=due_within)
+            deadlines = deadlines.filter(deadline__lte=window_end)
+            extra = [d for d in passed if d.deadline <= window_end]
+
+        # (deadline, report name) is unique per user -> usable as the keyset
+        paginator = KeysetPaginator(deadlines.select_related("report"), 25, ordering=["deadline", "report__name"])
+
+        # expire once the nearest deadline passes (it rolls forward and the order changes), when
+        # one of the user's grants expires, or when the next deadline outside the due_within window moves into it
+        queries = [
+            paginator.aget_page(cursor, extra),
+            upcoming.order_by("deadline").values_list("deadline", flat=True).afirst(),
+            UserReportAccess.objects.filter(user=user, expires_at__gt=now).order_by("expires_at").values_list("expires_at", flat=True).afirst(),
+        ]
+        if due_within is not None:
+            queries.append(upcoming.filter(deadline__gt=window_end).order_by("deadline").values_list("deadline", flat=True).afirst())
+        page_obj, *boundaries = await asyncio.gather(*queries)
+        rows = [(d.report.name, d.deadline) for d in page_obj.object_list]
+
+        if due_within is not None:
+            outside = [d.deadline for d in passed if d.deadline > window_end]
+            next_outside = min(filter(None, [boundaries.pop(), *outside]), default=None)
+            boundaries.append(next_outside and next_outside - timedelta(hours=due_within))
+        boundaries = [b for b in (*boundaries, *(d.deadline for d in passed)) if b is not None]
+        timeout = max(1, math.ceil((min(boundaries) - now).total_seconds())) if boundaries else None
+
+        cached = {"rows": rows, "next_cursor": page_obj.next_cursor, "previous_cursor": page_obj.previous_cursor}
+        await cache.aset(key, cached, timeout)
+
+    return cached["rows"], KeysetPage(cached["rows"], cached["next_cursor"], cached["previous_cursor"])
+
+# ----------------------
+# LIVE DEADLINES (SSE)
+# ----------------------
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _user_deadlines(user, now):
+    """[(report name, deadline)] for all of the user's active grants with upcoming deadlines"""
+    upcoming = UserDeadline.objects.for_user(user, now).filter(deadline__isnull=False)
+    return [row async for row in upcoming.order_by("deadline").values_list("report__name", "deadline")]
+
+
+async def _deadline_stream(user):
+    """
+    event stream for one user:
+        - `deadlines` with every (report, deadline) when the stream opens and whenever they change
+        - `overdue` with the reports whose deadline just passed (sent right before their rolled forward deadlines)
+    changes are noticed through the same cache versions core.signals bumps for the dashboard cache
+    (UserReportAccess / Report / TimeSlot saves), so an idle stream only reads the cache
+    """
+    poll = settings.CORE_EVENTS_POLL_SECONDS
+    heartbeat = settings.CORE_EVENTS_HEARTBEAT_SECONDS
+    loop = asyncio.get_running_loop()
+    started = last_sent = loop.time()
+    keys = (version_key("user", user.pk), version_key("reports"))
+    versions, rows = None, []
+
+    yield f"retry: {int(poll * 1000)}\n\n"
+    while loop.time() - started < settings.CORE_EVENTS_MAX_AGE:
+        now = timezone.now()
+        current = await aget_versions(*keys)
+        due = [(name, deadline) for name, deadline in rows if deadline <= now]
+
+        if due:
+            yield _sse("overdue", [{"report": name, "deadline": d.isoformat()} for name, d in due])
+        if due or current != versions:
+            versions = current
+            rows = await _user_deadlines(user, now)
+            # hand the connection back (to the pool) instead of holding it for the life of the stream
+            await sync_to_async(close_old_connections)()
+            yield _sse("deadlines", {
+                "now": now.isoformat(),
+                "deadlines": [{"report": name, "deadline": d.isoformat()} for name, d in rows],
+            })
+            last_sent = loop.time()
+        elif loop.time() - last_sent >= heartbeat:
+            yield ": keepalive\n\n"
+            last_sent = loop.time()
+
+        # wake up for the next deadline if it comes before the next poll
+        wait = poll
+        if rows:
+            wait = max(0.0, min(poll, (rows[0][1] - timezone.now()).total_seconds()))
+        await asyncio.sleep(wait)
+
+
+async def deadline_events(request):
+    """
+    server-sent events with the user's deadlines, used by the countdown script in base.html.
+        only served under ASGI: a WSGI server (runserver, demo/wsgi.py) buffers the whole stream and
+        would hold a worker for CORE_EVENTS_MAX_AGE, there the page countdowns just tick locally
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)        # 204 -> EventSource stops reconnecting
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(_deadline_stream(user), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"        # don't let nginx/caddy buffer the stream
+    return response
+
 
 # ----------------------
 # ADMIN REPORT VIEW
@@ -115,13 +257,12 @@ def admin_report_list(request):
     qs = (
         Report.objects
         .annotate(user_count=Count("user_links"))   # user_links means related_names on UserReportAccess.report
-        .orderby("name")
+        .order_by("name")
     )
 
-    # pagination for viewing list of users
-    paginator = Paginator(qs, 25)
-    page = request.GET.get("page") or 1
-    page_obj = paginator.get_page(page)
+    # pagination for viewing list of users (keyset on the unique name, no COUNT/OFFSET)
+    paginator = KeysetPaginator(qs, 25, ordering=["name"])
+    page_obj = paginator.get_page(request.GET.get("cursor"))
     return render(request, "reports/admin_report_list.html", {"page_obj" : page_obj})
 
 @staff_member_required
@@ -134,12 +275,11 @@ def admin_report_detail(request, slug):
         UserReportAccess.objects
         .select_related("user")
         .filter(report=report)
-        .order_by("user__username")
     )
 
-    paginator = Paginator(acess_qs, 50)
-    page = request.Get.get("page") or 1
-    page_obj = paginator.get_page(page)
+    # keyset in username order (as before), user_id breaks ties so the key stays unique; no COUNT/OFFSET
+    paginator = KeysetPaginator(access_qs, 50, ordering=["user__username", "user_id"])
+    page_obj = paginator.get_page(request.GET.get("cursor"))
 
     return render(
         request,
@@ -148,6 +288,18 @@ def admin_report_detail(request, slug):
     )
 
 
+# ----------------------
+# METRICS
+# ----------------------
+
+def metrics(request):
+    """prometheus scrape endpoint for this process' request metrics (staff or INTERNAL_IPS only)"""
+    allowed = request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS
+    if not (allowed or (request.user.is_authenticated and request.user.is_staff)):
+        raise PermissionDenied
+    return HttpResponse(request_metrics.render_prometheus(), content_type="text/plain; version=0.0.4")
+
+
 # ----------------------
 # USER VIEWS
 # ----------------------
@@ -157,49 +309,78 @@ def admin_report_detail(request, slug):
     #form_class = UserCreationForm
 
 
-@login_required
-def my_reports(request):
-    """
-        only returns the reports the current user can access. The `qs` objecft
-        will return a list of through-rows from which the report names can be extracted
-    """
+async def _get_profile(request):
+    """the profile UserTimezoneMiddleware attached to the request, created if the user doesn't have one yet"""
+    profile = getattr(request, "profile", None)
+    if profile is None:
+        profile, _ = await UserProfile.objects.aget_or_create(user=await request.auser())
+    return profile
 
-    # get user's time zone stuff
-    profile, _ = UserProfile.objects.get_or_create(user=request.user)
-    user_tz = profile.timezone or "UTC-5" # EST BY DEFAULT
 
-    # fetch UserReportAccess() objects and grab each one's Report() object
-    # then extract the time deadline
+async def _my_reports_page(user, cursor):
+    """one page of the user's active accesses (keyset on the unique report name)"""
     qs = (
         UserReportAccess.objects
-        .select_related("report", "report__time_deadline")
-        .filter(user=request.user)
-        .order_by("report__name")
+        .active()
+        .select_related("report", "report__time_deadline", "user_deadline")
+        .filter(user=user)
     )
+    paginator = KeysetPaginator(qs, 25, ordering=["report__name"])
+    return await paginator.aget_page(cursor)
 
-    logger.error(qs)
-
-    # save qs as list 
-    accesses = list(qs)
 
-    # convert the deadlines for each report into the user's timezone 
-    for access in accesses:
-        access.local_deadline = access.report.deadline_for_user(request.user)
+@login_required
+async def my_reports(request):
+    """
+        only returns the reports the current user can access. The `qs` objecft
+        will return a list of through-rows from which the report names can be extracted
+    """
 
-    pageinator = Paginator(accesses, 25)
-    page = request.GET.get("page") or 1
-    page_obj = pageinator.get_page(page)
+    # get user's time zone stuff and the user's UserReportAccess() objects (with each one's Report()
+    # object and precomputed deadline) at the same time
+    user = await request.auser()
+    profile, page_obj, version = await asyncio.gather(
+        _get_profile(request),
+        _my_reports_page(user, request.GET.get("cursor")),
+        afragment_version(user.pk),
+    )
+    user_tz = profile.timezone or "America/New_York" # EST BY DEFAULT
+    accesses = page_obj.object_list
 
-    return render(request, "core/my_reports.html", {"page_obj" : page_obj})
+    # convert the deadlines for each report into the user's timezone
+    tz = get_zoneinfo(user_tz)
+    now = timezone.now()
+    missing = []
+    for access in accesses:
+        try:
+            deadline = access.user_deadline.deadline
+        except UserDeadline.DoesNotExist:
+            missing.append(access)      # not precomputed yet (refresh_deadlines hasn't run)
+            continue
+        if deadline is not None and deadline < now:
+            missing.append(access)      # passed, not rolled forward yet -> computed here, the row isn't written
+            continue
+        access.local_deadline = deadline.astimezone(tz) if deadline else None
+
+    # same fallback as the dashboard (_dashboard_page)
+    if missing:
+        await sync_to_async(with_current_deadlines)(missing, from_dt=now, tz=user_tz)
+    for access in missing:
+        access.local_deadline = access.deadline
+
+    # the versions cover renames/role and timezone changes, the rows' deadlines cover roll forwards and expired grants
+    rows = ",".join(f"{a.pk}@{a.local_deadline.timestamp():.0f}" if a.local_deadline else str(a.pk) for a in accesses)
+    fragment_key = f"{version}:{request.GET.urlencode()}:{rows}"
+    return render(request, "core/my_reports.html", {"page_obj" : page_obj, "fragment_key" : fragment_key})
 
 @login_required
-def edit_my_settings(request):
+async def edit_my_settings(request):
     """user settings where they can edit their profile"""
-    profile, _ = UserProfile.objects.get_or_create(user=request.user)
+    profile = await _get_profile(request)
     if request.method == "POST":        # submitting form 
         form = ProfileForm(request.POST, instance=profile)
-        if form.is_valid():
-            form.save()
+        if await sync_to_async(form.is_valid)():
+            await sync_to_async(form.save)()
             messages.success(request, 'Settings Saved!')
             return redirect("my_settings")
     else:                               # requesting form
@@ -207,7 +388,83 @@ def edit_my_settings(request):
     return render(request, "core/edit_my_settings.html", {"form": form})
 
 @login_required
-def my_settings(request):
+async def my_settings(request):
     """user settings where they can edit their profile"""
-    profile = UserProfile.objects.get(user=request.user)
-    return render(request, "core/my_settings.html", {"profile" : profile})
\ No newline at end of file
+    profile = await _get_profile(request)
+    return render(request, "core/my_settings.html", {"profile" : profile})
+
+
+# ----------------------
+# DATA ENTRY
+# ----------------------
+
+@login_required
+def report_entries(request, slug):
+    """
+    the data entry table of a report, in one request each way.
+        GET: the user's rows (all rows for owners) as a JSON array, or CSV with ?format=csv
+        POST: the whole edited table as a JSON array or CSV (Content-Type text/csv), validated and
+              upserted on row_key; ?dry_run=1 only validates. Answers with created/updated counts, or
+              with a 400 and the errors of every rejected row (nothing is saved then).
+    """
+    report = get_object_or_404(Report, slug=slug)
+
+    if request.method == "POST":
+        if not has_report_role(request.user, report, "edit"):
+            raise PermissionDenied
+        fmt = "csv" if request.content_type == "text/csv" else "json"
+        try:
+            rows = read_table(request.body, fmt)
+        except (TableError, UnicodeDecodeError, csv.Error) as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+        if len(rows) > settings.CORE_ENTRY_MAX_ROWS:
+            return JsonResponse({"error": f"at most {settings.CORE_ENTRY_MAX_ROWS} rows per request"}, status=400)
+
+        table = EntryTable(report, request.user, rows)
+        if request.GET.get("dry_run"):
+            table.validate()
+        else:
+            table.save()
+        return JsonResponse(table.result(), status=400 if table.errors else 200)
+
+    if not has_report_role(request.user, report, "view"):
+        raise PermissionDenied
+    fmt = request.GET.get("format", "json")
+    if fmt not in ENTRY_FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(ENTRY_FORMATS)}"}, status=400)
+    content_type = "text/csv" if fmt == "csv" else "application/json"
+    return streaming_response(request, iter_entries(entries_for(request.user, report), fmt), content_type=content_type)
+
+
+@login_required
+def export_entries(request):
+    """
+    the entries of every report the user can view (?report=<slug>, repeatable, to pick reports) in a
+        columnar format for dataframes: an Arrow IPC stream (default) or a Parquet download (?format=parquet).
+        Sends an ETag (core.entries.entries_etag), a matching If-None-Match gets a 304
+    """
+    fmt = request.GET.get("format", "arrow")
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
+
+    report_ids = None
+    slugs = request.GET.getlist("report")
+    if slugs:
+        report_ids = list(Report.objects.filter(slug__in=slugs).values_list("pk", flat=True))
+    entries = visible_entries(request.user, report_ids)
+
+    etag = entries_etag(entries, fmt)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    if fmt == "parquet":
+        file = write_entries_parquet(entries, tempfile.TemporaryFile())
+        file.seek(0)
+        response = FileResponse(file, as_attachment=True, filename="entries.parquet", content_type=EXPORT_FORMATS[fmt])
+    else:
+        response = streaming_response(request, iter_entries_arrow(entries), content_type=EXPORT_FORMATS[fmt])
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"     # always revalidate, the 304 makes that cheap
+    return response
+
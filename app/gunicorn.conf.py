@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+"""
+gunicorn settings for the web container (gunicorn picks this file up from the working directory).
+
+The app is imported once in the master (preload_app) and the workers are forked from it, so a new
+worker starts without importing Django again and shares the master's memory pages. gc.freeze() before
+each fork moves everything loaded so far out of the collector's reach, otherwise the first collection
+in a worker touches (and so copies) every one of those pages.
+"""
+import gc
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 3))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = 120
+preload_app = True
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # nothing should have connected while loading the app, but never share a socket between processes
+    from django.db import connections
+    connections.close_all()